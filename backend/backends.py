@@ -0,0 +1,116 @@
+import importlib
+import threading
+from typing import Any, Callable, Dict, List
+
+# Modules each collector imports on its first scan; prewarm() loads them up front
+COLLECTOR_MODULES: Dict[str, List[str]] = {
+    'ssh': ['paramiko'],
+    'snmp': ['pysnmp.hlapi.v3arch.asyncio'],
+    'wmi': ['winrm.protocol'],
+    'ad': ['winrm.protocol'],
+}
+
+
+class Lazy:
+    """A value built by its factory on first use. Safe to resolve from worker threads."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def get(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._value = self._factory()
+                    self._built = True
+        return self._value
+
+    def set(self, value):
+        """Replace the value, e.g. to inject a stand-in before first use"""
+        with self._lock:
+            self._value = value
+            self._built = True
+
+
+class LazyCollection:
+    """Collection handle that resolves its database on every call"""
+
+    def __init__(self, database: Lazy, name: str):
+        self._database = database
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        return getattr(self._database.get()[self._name], attr)
+
+
+class LazyDatabase:
+    """
+    Motor database handle whose client is only created on first use.
+
+    Collections taken at import time (db.devices, db.scan_schedules, ...) stay
+    lazy, so importing server.py opens no client, and a stand-in database can
+    still be bound afterwards.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._database = Lazy(factory)
+
+    @property
+    def built(self) -> bool:
+        return self._database.built
+
+    def bind(self, database):
+        self._database.set(database)
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return LazyCollection(self._database, name)
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(self._database, name)
+
+    def close(self):
+        if self.built:
+            client = getattr(self._database.get(), 'client', None)
+            if client is not None:
+                client.close()
+
+
+# Port scanner backends by name; NetworkScanner builds one on its first scan
+PORT_SCANNERS: Dict[str, Callable[[], Any]] = {}
+
+
+def register_port_scanner(name: str, factory: Callable[[], Any]):
+    PORT_SCANNERS[name] = factory
+
+
+def create_port_scanner(name: str = 'nmap'):
+    if name not in PORT_SCANNERS:
+        raise ValueError(f"Unknown scanner backend {name!r}. Use one of: {', '.join(PORT_SCANNERS)}")
+    return PORT_SCANNERS[name]()
+
+
+def _nmap_port_scanner():
+    import nmap
+
+    # Runs `nmap --version` to locate the binary
+    return nmap.PortScanner()
+
+
+register_port_scanner('nmap', _nmap_port_scanner)
+
+
+def import_collector(name: str):
+    """Import the third-party modules a collector needs"""
+    if name not in COLLECTOR_MODULES:
+        raise ValueError(f"Unknown collector {name!r}. Use one of: {', '.join(COLLECTOR_MODULES)}")
+    for module in COLLECTOR_MODULES[name]:
+        importlib.import_module(module)
@@ -0,0 +1,9 @@
+"""
+Benchmark suite for the network scanner backend.
+
+Runs NetworkScanner and the server.py endpoints against a simulated network
+served by a fake nmap backend, so results are reproducible and need neither
+nmap nor real hosts. Run from the backend directory:
+
+    python -m benchmarks --network 10.0.0.0/20
+"""
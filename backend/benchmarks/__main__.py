@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.fake_nmap import FakePortScanner
+from benchmarks.fake_winrm import FakeWinRMServer
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return usage / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def load_server(args):
+    """
+    Import server.py wired to the fake nmap backend and an in-process or
+    local Mongo, without touching the real environment.
+    """
+    from backends import register_port_scanner
+
+    os.environ.setdefault('MONGO_URL', args.mongo_url or 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', args.db_name)
+    os.environ['SCANNER_BACKEND'] = 'bench'
+    register_port_scanner('bench', lambda: FakePortScanner(up_ratio=args.up_ratio, seed=args.seed))
+
+    import server
+
+    # server.py configures INFO logging; per-request lines would dominate the timings
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    # server.db is lazy, so the benchmark database can be bound before first use
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        server.db.bind(AsyncIOMotorClient(args.mongo_url)[args.db_name])
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("mongomock-motor is required for the in-process Mongo (or pass --mongo-url)")
+        server.db.bind(AsyncMongoMockClient()[args.db_name])
+    return server
+
+
+# Imports server.py in a fresh interpreter, then runs the app's startup
+# hooks, and reports what each step did
+STARTUP_PROBE = '''
+import asyncio, json, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+result = {
+    'seconds': imported - start,
+    'db_connected': server.db.built,
+    'scanner_built': server.scanner._nm.built,
+}
+
+async def startup():
+    started = time.perf_counter()
+    await server.app.router.startup()
+    return time.perf_counter() - started
+
+result['startup_seconds'] = asyncio.run(startup())
+print(json.dumps(result))
+'''
+
+
+def bench_startup(runs: int) -> Dict:
+    """
+    Time `import server` and the app's startup hooks in fresh interpreters,
+    as a worker restart would. Mongo points at a closed port and the real
+    nmap backend is selected, so an import that connects or runs nmap is
+    caught, as is a startup hook that waits for Mongo.
+    """
+    env = {
+        **os.environ,
+        # Long enough that a startup hook waiting on Mongo blows the budget
+        'MONGO_URL': 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=5000',
+        'SCHEDULER_ENABLED': 'false',
+        'DB_NAME': 'netinv_startup',
+        'SCANNER_BACKEND': 'nmap',
+    }
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    startup_samples = []
+    probe = {}
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE], cwd=backend_dir, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        samples.append(probe['seconds'])
+        startup_samples.append(probe['startup_seconds'])
+    return {
+        'runs': runs,
+        'import_seconds': round(statistics.median(samples), 4),
+        'startup_seconds': round(statistics.median(startup_samples), 4),
+        'db_connected': probe['db_connected'],
+        'scanner_built': probe['scanner_built'],
+    }
+
+
+async def bench_discovery(server, network: str) -> Dict:
+    """Time NetworkScanner.discover_network directly"""
+    start = time.perf_counter()
+    devices = await server.scanner.discover_network(network, 'bench-direct')
+    elapsed = time.perf_counter() - start
+    return {
+        'hosts': len(devices),
+        'seconds': round(elapsed, 4),
+        'hosts_per_sec': round(len(devices) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def timed(client, method: str, url: str, samples: Dict[str, List[float]], name: str, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    response.raise_for_status()
+    return response
+
+
+async def bench_endpoints(server, network: str, iterations: int) -> Dict:
+    """Drive the API end to end: discovery, listing, detail and detailed scans"""
+    import httpx
+
+    samples: Dict[str, List[float]] = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        start = time.perf_counter()
+        response = await timed(client, 'POST', '/api/scan/discover', samples, 'POST /scan/discover',
+                               json={'network_range': network})
+        scan_id = response.json()['scan_id']
+        while True:
+            status = (await client.get(f'/api/scan/status/{scan_id}')).json()
+            if status['status'] != 'running':
+                break
+            await asyncio.sleep(0.01)
+        pipeline_seconds = time.perf_counter() - start
+
+        devices = (await timed(client, 'GET', '/api/devices', samples, 'GET /devices')).json()
+        for i in range(iterations):
+            await timed(client, 'GET', '/api/devices', samples, 'GET /devices', params={'scan_id': scan_id})
+            await timed(client, 'GET', '/api/devices', samples, 'GET /devices?view=summary',
+                        params={'scan_id': scan_id, 'view': 'summary'})
+            if devices:
+                device = devices[i % len(devices)]
+                await timed(client, 'GET', f"/api/devices/{device['id']}", samples, 'GET /devices/{id}')
+                await timed(client, 'POST', '/api/scan/detailed', samples, 'POST /scan/detailed', json={
+                    'device_id': device['id'],
+                    # No collector matches this auth type, so only the fake nmap runs
+                    'credentials': {'username': 'bench', 'password': 'bench', 'auth_type': 'none'},
+                })
+            await timed(client, 'GET', '/api/scans', samples, 'GET /scans')
+            await timed(client, 'GET', '/api/stats', samples, 'GET /stats', params={'scan_id': scan_id})
+            await timed(client, 'GET', '/api/metrics', samples, 'GET /metrics')
+
+    return {
+        'pipeline': {
+            'status': status['status'],
+            'hosts': status['total_devices'],
+            'seconds': round(pipeline_seconds, 4),
+            'hosts_per_sec': round(status['total_devices'] / pipeline_seconds, 1) if pipeline_seconds else 0.0,
+        },
+        'latency_ms': {
+            name: {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 3),
+                'p99': round(percentile(values, 99), 3),
+            }
+            for name, values in samples.items()
+        },
+    }
+
+
+async def bench_winrm(hosts: int, rounds: int, concurrency: int, latency: float) -> Dict:
+    """Drive the WinRM collector against the local WS-Man stand-in, one 127.0.0.x address per host"""
+    from winrm_collector import WinRMCollector
+
+    with FakeWinRMServer(latency=latency) as server:
+        collector = WinRMCollector(transport='basic', port=server.port, max_concurrent=concurrency)
+        samples: List[float] = []
+
+        async def collect(ip_address: str):
+            start = time.perf_counter()
+            await collector.collect(ip_address, 'bench', 'bench')
+            samples.append((time.perf_counter() - start) * 1000)
+
+        addresses = [f'127.0.{(i + 2) // 256}.{(i + 2) % 256}' for i in range(hosts)]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(collect(ip) for ip in addresses))
+        elapsed = time.perf_counter() - start
+        collector.close()
+
+        return {
+            'hosts': hosts * rounds,
+            'seconds': round(elapsed, 4),
+            'hosts_per_sec': round(hosts * rounds / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p99_ms': round(percentile(samples, 99), 3),
+            # One connection per host means sessions were reused across rounds
+            'connections': server.stats['connections'],
+        }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return regressions of results against a baseline beyond tolerance"""
+    regressions = []
+    old_import = baseline.get('startup', {}).get('import_seconds')
+    new_import = results.get('startup', {}).get('import_seconds')
+    if old_import and new_import is not None and new_import > old_import * (1 + tolerance):
+        regressions.append(f"server import {new_import}s > baseline {old_import}s")
+    old_startup = baseline.get('startup', {}).get('startup_seconds')
+    new_startup = results.get('startup', {}).get('startup_seconds')
+    if old_startup and new_startup is not None and new_startup > old_startup * (1 + tolerance):
+        regressions.append(f"app startup {new_startup}s > baseline {old_startup}s")
+    for section in ('discovery', 'pipeline', 'winrm'):
+        old = baseline.get(section, {}).get('hosts_per_sec')
+        new = results.get(section, {}).get('hosts_per_sec')
+        if old and new is not None and new < old * (1 - tolerance):
+            regressions.append(f"{section} hosts/sec {new} < baseline {old}")
+    for name, stats in results.get('latency_ms', {}).items():
+        old = baseline.get('latency_ms', {}).get(name, {}).get('p99')
+        if old and stats['p99'] > old * (1 + tolerance):
+            regressions.append(f"{name} p99 {stats['p99']}ms > baseline {old}ms")
+    old_rss = baseline.get('peak_rss_mb')
+    if old_rss and results['peak_rss_mb'] > old_rss * (1 + tolerance):
+        regressions.append(f"peak RSS {results['peak_rss_mb']}MiB > baseline {old_rss}MiB")
+    return regressions
+
+
+def check_startup(startup: Dict, budget: float, startup_budget: float) -> List[str]:
+    """Return violations of the startup budget"""
+    violations = []
+    if startup['import_seconds'] > budget:
+        violations.append(f"server import {startup['import_seconds']}s > budget {budget}s")
+    if startup['startup_seconds'] > startup_budget:
+        violations.append(f"app startup hooks {startup['startup_seconds']}s > budget {startup_budget}s")
+    if startup['db_connected']:
+        violations.append("server import created the Mongo client")
+    if startup['scanner_built']:
+        violations.append("server import built the nmap backend")
+    return violations
+
+
+def print_report(results: Dict):
+    print(f"Network: {results['network']}")
+    if 'startup' in results:
+        startup = results['startup']
+        print(f"  startup    import server {startup['import_seconds']:.3f}s, "
+              f"startup hooks {startup['startup_seconds']:.3f}s (median of {startup['runs']})")
+    for section in ('discovery', 'pipeline', 'winrm'):
+        if section not in results:
+            continue
+        data = results[section]
+        print(f"  {section:<10} {data['hosts']:>7} hosts in {data['seconds']:>8.3f}s  "
+              f"({data['hosts_per_sec']} hosts/sec)")
+    if 'winrm' in results:
+        winrm = results['winrm']
+        print(f"  WinRM per-host latency p50={winrm['p50_ms']}ms p99={winrm['p99_ms']}ms, "
+              f"{winrm['connections']} connections")
+    print("  Endpoint latency (ms):")
+    for name, stats in results['latency_ms'].items():
+        print(f"    {name:<28} n={stats['count']:<5} p50={stats['p50']:<9} p99={stats['p99']}")
+    print(f"  Peak RSS: {results['peak_rss_mb']} MiB")
+
+
+async def run(args) -> Dict:
+    results = {'network': args.network}
+    if args.startup_runs:
+        # Before load_server, so this process's imports do not warm anything
+        results['startup'] = bench_startup(args.startup_runs)
+    server = load_server(args)
+    results['discovery'] = await bench_discovery(server, args.network)
+    results.update(await bench_endpoints(server, args.network, args.iterations))
+    if args.winrm_hosts:
+        results['winrm'] = await bench_winrm(args.winrm_hosts, args.winrm_rounds,
+                                             args.winrm_concurrency, args.winrm_latency)
+    results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark the scanner backend against a simulated network'
+    )
+    parser.add_argument('--network', default='10.0.0.0/24', help='Simulated network (/24 to /16)')
+    parser.add_argument('--up-ratio', type=float, default=0.3, help='Fraction of addresses that respond')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the simulated network')
+    parser.add_argument('--iterations', type=int, default=50, help='Requests per endpoint')
+    parser.add_argument('--winrm-hosts', type=int, default=32, help='Hosts for the WinRM stage (0 to skip)')
+    parser.add_argument('--winrm-rounds', type=int, default=3, help='Collections per WinRM host')
+    parser.add_argument('--winrm-concurrency', type=int, default=16)
+    parser.add_argument('--winrm-latency', type=float, default=0.005, help='Simulated WS-Man round trip (s)')
+    parser.add_argument('--startup-runs', type=int, default=3, help='Fresh-interpreter imports to time (0 to skip)')
+    parser.add_argument('--import-budget', type=float, default=1.0, help='Max seconds to import server.py')
+    parser.add_argument('--startup-budget', type=float, default=0.5, help='Max seconds for the app startup hooks')
+    parser.add_argument('--mongo-url', help='Use a local mongod instead of the in-process stand-in')
+    parser.add_argument('--db-name', default='netinv_bench')
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    parser.add_argument('--baseline', help='Fail if results regress against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression ratio')
+    parser.add_argument('--verbose', action='store_true', help='Keep server INFO logging')
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = []
+    if 'startup' in results:
+        regressions.extend(check_startup(results['startup'], args.import_budget, args.startup_budget))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions.extend(compare(results, json.load(f), args.tolerance))
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
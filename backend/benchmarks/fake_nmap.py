@@ -0,0 +1,127 @@
+import ipaddress
+import random
+import time
+from typing import List, Tuple
+from xml.sax.saxutils import quoteattr
+
+import nmap
+
+# Service catalogue used to populate synthetic hosts: (port, service, product)
+SERVICES = [
+    (22, 'ssh', 'OpenSSH'),
+    (80, 'http', 'nginx'),
+    (443, 'https', 'nginx'),
+    (445, 'microsoft-ds', 'Microsoft Windows SMB'),
+    (554, 'rtsp', 'Hikvision'),
+    (631, 'ipp', 'CUPS'),
+    (3389, 'ms-wbt-server', 'Microsoft Terminal Services'),
+    (5985, 'wsman', 'Microsoft HTTPAPI'),
+    (8080, 'http-proxy', 'Apache Tomcat'),
+    (161, 'snmp', 'net-snmp'),
+]
+
+# OS profiles: (name, type, vendor, family)
+OS_PROFILES = [
+    ('Linux 5.4 - 5.15', 'general purpose', 'Linux', 'Linux'),
+    ('Microsoft Windows Server 2019', 'general purpose', 'Microsoft', 'Windows'),
+    ('Microsoft Windows 10 21H2', 'general purpose', 'Microsoft', 'Windows'),
+    ('Cisco IOS 15.X', 'switch', 'Cisco', 'IOS'),
+    ('Juniper JUNOS 20.X', 'router', 'Juniper', 'JUNOS'),
+    ('HP LaserJet printer', 'printer', 'HP', 'embedded'),
+]
+
+HOSTNAME_PREFIXES = ['srv-', 'ws-', 'sw-', 'rt-', 'printer-', 'cam-', 'ap-', 'host-']
+
+
+class FakePortScanner(nmap.PortScanner):
+    """
+    Drop-in replacement for nmap.PortScanner backed by a simulated network.
+
+    Each address is deterministically up or down (seeded by the address), and
+    scan() feeds synthetic nmap XML through python-nmap's own parser so the
+    scanner sees exactly the structures a real run would produce.
+    """
+
+    def __init__(self, up_ratio: float = 0.3, seed: int = 1, latency_per_host: float = 0.0):
+        # Deliberately skip nmap.PortScanner.__init__, which looks for the nmap binary
+        self._nmap_path = 'nmap'
+        self._scan_result = {}
+        self._nmap_version_number = 7
+        self._nmap_subversion_number = 94
+        self._nmap_last_output = ''
+        self.up_ratio = up_ratio
+        self.seed = seed
+        self.latency_per_host = latency_per_host
+        self.scans_run = 0
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        self.scans_run += 1
+        detailed = '-sn' not in arguments.split()
+        targets = self._expand(hosts)
+        live = [ip for ip in targets if self._is_up(ip)]
+
+        if self.latency_per_host:
+            time.sleep(self.latency_per_host * len(targets))
+
+        xml = self._render(live, len(targets), arguments, detailed)
+        self._nmap_last_output = xml
+        return self.analyse_nmap_xml_scan(nmap_xml_output=xml)
+
+    def _expand(self, hosts: str) -> List[str]:
+        targets = []
+        for part in hosts.split():
+            network = ipaddress.ip_network(part, strict=False)
+            if network.num_addresses == 1:
+                targets.append(str(network.network_address))
+            else:
+                targets.extend(str(ip) for ip in network.hosts())
+        return targets
+
+    def _rng(self, ip: str) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + int(ipaddress.ip_address(ip)))
+
+    def _is_up(self, ip: str) -> bool:
+        return self._rng(ip).random() < self.up_ratio
+
+    def host_profile(self, ip: str) -> Tuple[str, str, List[Tuple[int, str, str]], Tuple[str, str, str, str]]:
+        """Return the (hostname, mac, services, os) the simulated host exposes"""
+        rng = self._rng(ip)
+        rng.random()  # consumed by _is_up
+        octets = int(ipaddress.ip_address(ip)) & 0xFFFFFF
+        mac = '02:00:00:%02X:%02X:%02X' % ((octets >> 16) & 0xFF, (octets >> 8) & 0xFF, octets & 0xFF)
+        hostname = f"{rng.choice(HOSTNAME_PREFIXES)}{ip.replace('.', '-')}.bench.local"
+        services = sorted(rng.sample(SERVICES, rng.randint(1, 4)))
+        os_profile = rng.choice(OS_PROFILES)
+        return hostname, mac, services, os_profile
+
+    def _render(self, live: List[str], total: int, arguments: str, detailed: bool) -> str:
+        parts = [f'<?xml version="1.0"?><nmaprun scanner="nmap" args={quoteattr("nmap " + arguments)} '
+                 f'start="0" version="7.94">']
+        for ip in live:
+            hostname, mac, services, os_profile = self.host_profile(ip)
+            parts.append('<host><status state="up" reason="arp-response" reason_ttl="0"/>')
+            parts.append(f'<address addr="{ip}" addrtype="ipv4"/>')
+            parts.append(f'<address addr="{mac}" addrtype="mac" vendor="Bench"/>')
+            parts.append(f'<hostnames><hostname name="{hostname}" type="PTR"/></hostnames>')
+            if detailed:
+                parts.append('<ports>')
+                for port, service, product in services:
+                    parts.append(
+                        f'<port protocol="tcp" portid="{port}">'
+                        f'<state state="open" reason="syn-ack" reason_ttl="64"/>'
+                        f'<service name="{service}" product="{product}" version="1.0" '
+                        f'extrainfo="" method="probed" conf="10"/></port>'
+                    )
+                parts.append('</ports>')
+                name, os_type, vendor, family = os_profile
+                parts.append(
+                    f'<os><osmatch name="{name}" accuracy="96" line="1">'
+                    f'<osclass type="{os_type}" vendor="{vendor}" osfamily="{family}" osgen="" accuracy="96"/>'
+                    f'</osmatch></os>'
+                )
+            parts.append('</host>')
+        parts.append(
+            f'<runstats><finished time="0" timestr="" elapsed="0.00" exit="success"/>'
+            f'<hosts up="{len(live)}" down="{total - len(live)}" total="{total}"/></runstats></nmaprun>'
+        )
+        return ''.join(parts)
@@ -0,0 +1,161 @@
+import json
+import socket
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from base64 import b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# Inventory the stand-in returns for every host, shaped like INVENTORY_SCRIPT output
+SAMPLE_INVENTORY = {
+    'hostname': 'BENCH-WIN01',
+    'domain': 'bench.local',
+    'manufacturer': 'Dell Inc.',
+    'model': 'PowerEdge R650',
+    'os_name': 'Microsoft Windows Server 2022 Standard',
+    'os_version': '10.0.20348',
+    'os_build': '20348',
+    'memory_bytes': 68719476736,
+    'cpu': [{'name': 'Intel(R) Xeon(R) Silver 4314 CPU @ 2.40GHz', 'cores': 16, 'threads': 32}],
+    'disks': [{'drive': 'C:', 'size': 511101108224, 'free': 301101108224}],
+    'installed_software_count': 87,
+}
+
+ENVELOPE = (
+    '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope" '
+    'xmlns:a="http://schemas.xmlsoap.org/ws/2004/08/addressing" '
+    'xmlns:w="http://schemas.dmtf.org/wbem/wsman/1/wsman.xsd" '
+    'xmlns:x="http://schemas.xmlsoap.org/ws/2004/09/transfer" '
+    'xmlns:rsp="http://schemas.microsoft.com/wbem/wsman/1/windows/shell">'
+    '<s:Header><a:RelatesTo>{message_id}</a:RelatesTo></s:Header>'
+    '<s:Body>{body}</s:Body></s:Envelope>'
+)
+
+COMMAND_DONE = 'http://schemas.microsoft.com/wbem/wsman/1/windows/shell/CommandState/Done'
+
+# The fault a Receive returns when the command produced nothing within the operation timeout
+RECEIVE_TIMED_OUT = (
+    '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope" '
+    'xmlns:f="http://schemas.microsoft.com/wbem/wsman/1/wsmanfault">'
+    '<s:Body><s:Fault><s:Code><s:Value>s:Receiver</s:Value></s:Code>'
+    '<s:Reason><s:Text>The WS-Management service cannot complete the operation within the time specified.</s:Text></s:Reason>'
+    '<s:Detail><f:WSManFault Code="2150858793"/></s:Detail></s:Fault></s:Body></s:Envelope>'
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so session reuse is observable
+
+    def setup(self):
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls dominating the timings
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        with self.server.stats_lock:
+            self.server.stats['connections'] += 1
+        super().handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        root = ET.fromstring(body)
+        action = next(n.text for n in root.iter() if n.tag.endswith('Action'))
+        message_id = next(n.text for n in root.iter() if n.tag.endswith('MessageID'))
+        operation = action.rsplit('/', 1)[-1]
+
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+            self.server.stats[operation] = self.server.stats.get(operation, 0) + 1
+            failing = self.server.failures > 0
+            if failing:
+                self.server.failures -= 1
+
+        if failing:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if operation == 'Create':
+            content = (
+                '<x:ResourceCreated><a:ReferenceParameters><w:SelectorSet>'
+                f'<w:Selector Name="ShellId">{uuid.uuid4()}</w:Selector>'
+                '</w:SelectorSet></a:ReferenceParameters></x:ResourceCreated>'
+            )
+        elif operation == 'Command':
+            content = f'<rsp:CommandResponse><rsp:CommandId>{uuid.uuid4()}</rsp:CommandId></rsp:CommandResponse>'
+        elif operation == 'Receive' and self.server.hang:
+            # A command that never finishes, e.g. a CIM query against a broken WMI repository
+            time.sleep(self.server.receive_timeout)
+            payload = RECEIVE_TIMED_OUT.encode('utf-8')
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/soap+xml;charset=UTF-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        elif operation == 'Receive':
+            stdout = b64encode(json.dumps(self.server.inventory).encode('utf-8')).decode('ascii')
+            content = (
+                '<rsp:ReceiveResponse>'
+                f'<rsp:Stream Name="stdout">{stdout}</rsp:Stream>'
+                '<rsp:Stream Name="stdout" End="true"></rsp:Stream>'
+                f'<rsp:CommandState State="{COMMAND_DONE}"><rsp:ExitCode>0</rsp:ExitCode></rsp:CommandState>'
+                '</rsp:ReceiveResponse>'
+            )
+        else:
+            # Signal and Delete only need the RelatesTo header
+            content = ''
+
+        payload = ENVELOPE.format(message_id=message_id, body=content).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/soap+xml;charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeWinRMServer(ThreadingHTTPServer):
+    """
+    Local WS-Management stand-in speaking just enough of the shell protocol
+    for pywinrm's open_shell/run_command/receive/signal/delete cycle.
+    Binds all interfaces so 127.0.0.x addresses can play distinct hosts.
+    """
+
+    daemon_threads = True
+    # Room for every concurrent first connection; the default backlog of 5 resets the rest
+    request_queue_size = 128
+
+    def __init__(self, port: int = 0, latency: float = 0.0, inventory: Optional[Dict] = None):
+        super().__init__(('0.0.0.0', port), _Handler)
+        self.latency = latency
+        self.inventory = inventory or SAMPLE_INVENTORY
+        # Number of upcoming requests answered with HTTP 500
+        self.failures = 0
+        # When set, commands never finish: each Receive times out after receive_timeout seconds
+        self.hang = False
+        self.receive_timeout = 0.1
+        self.stats: Dict[str, int] = {'connections': 0, 'requests': 0}
+        self.stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
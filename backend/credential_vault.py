@@ -0,0 +1,176 @@
+import ipaddress
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+class VaultUnavailableError(Exception):
+    """Raised when the vault is used without an encryption key configured"""
+
+
+class CredentialVault:
+    """
+    Encrypted credential profiles matched to hosts by CIDR and device type.
+
+    Secrets are Fernet-encrypted at rest and only decrypted when a scan needs
+    them. Per host, the vault remembers which profile last worked and which
+    recently failed, so rescans try the known-good credential first and skip
+    attempts that would only fail (and wait out their timeouts) again.
+    """
+
+    def __init__(self, profiles, hints, key: Optional[str], failure_ttl: float = 86400.0,
+                 profile_ttl: float = 10.0):
+        self.profiles = profiles
+        self.hints = hints
+        self.failure_ttl = failure_ttl
+        # Profiles are re-read after this many seconds so changes made through
+        # other replicas are picked up; local changes reset it immediately
+        self.profile_ttl = profile_ttl
+        self._fernet = None
+        self._cache: Optional[Tuple[float, List[Dict]]] = None
+        if key:
+            from cryptography.fernet import Fernet
+            self._fernet = Fernet(key.encode('utf-8'))
+
+    @property
+    def enabled(self) -> bool:
+        return self._fernet is not None
+
+    def _require_key(self):
+        if not self.enabled:
+            raise VaultUnavailableError("Credential vault is disabled: set CREDENTIAL_VAULT_KEY")
+
+    async def create_profile(self, name: str, auth_type: str, username: str, password: str,
+                             cidrs: List[str], device_types: List[str], priority: int = 0) -> Dict:
+        """Store a new profile and return it without its secret"""
+        self._require_key()
+        for cidr in cidrs:
+            ipaddress.ip_network(cidr, strict=False)
+
+        profile = {
+            'id': str(uuid.uuid4()),
+            'name': name,
+            'auth_type': auth_type,
+            'username': username,
+            'secret': self._fernet.encrypt(password.encode('utf-8')).decode('ascii'),
+            'cidrs': cidrs,
+            'device_types': device_types,
+            'priority': priority,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        await self.profiles.insert_one(profile)
+        self._cache = None
+        return self.public(profile)
+
+    async def delete_profile(self, profile_id: str) -> bool:
+        result = await self.profiles.delete_one({'id': profile_id})
+        self._cache = None
+        return result.deleted_count > 0
+
+    async def get_profile(self, profile_id: str) -> Optional[Dict]:
+        """Return a profile without its secret, read from the database rather than the cache"""
+        profile = await self.profiles.find_one({'id': profile_id}, {'_id': 0})
+        return self.public(profile) if profile else None
+
+    async def list_profiles(self) -> List[Dict]:
+        return [self.public(p) for p in await self._load()]
+
+    @staticmethod
+    def public(profile: Dict) -> Dict:
+        return {k: v for k, v in profile.items() if k not in ('secret', '_id')}
+
+    async def _load(self) -> List[Dict]:
+        now = time.monotonic()
+        if self._cache is None or self._cache[0] <= now:
+            profiles = await self.profiles.find({}, {'_id': 0}).sort('priority', -1).to_list(10000)
+            self._cache = (now + self.profile_ttl, profiles)
+        return self._cache[1]
+
+    def _credentials(self, profile: Dict) -> Dict:
+        password = self._fernet.decrypt(profile['secret'].encode('ascii')).decode('utf-8')
+        credentials = {
+            'profile_id': profile['id'],
+            'auth_type': profile['auth_type'],
+            'username': profile['username'],
+            'password': password,
+        }
+        if profile['auth_type'] == 'snmp':
+            # SNMP profiles keep the community string as their secret
+            credentials['community'] = password
+        return credentials
+
+    @staticmethod
+    def _specificity(profile: Dict, ip_address: str, device_type: str) -> Optional[Tuple[int, int]]:
+        """Return a sort key if the profile applies to the host, else None"""
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            address = None
+
+        cidrs = profile.get('cidrs') or []
+        device_types = profile.get('device_types') or []
+        prefix = -1
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr, strict=False)
+            if address is not None and address.version == network.version and address in network:
+                prefix = max(prefix, network.prefixlen)
+
+        if cidrs and prefix < 0:
+            return None
+        if device_types and device_type not in device_types:
+            return None
+        # Longest matching prefix first, then device-type scoped, then unscoped fallbacks
+        return (prefix, 1 if device_types else 0)
+
+    async def candidates(self, devices: List[Dict], profile_id: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """
+        Ordered credentials to try for each device, keyed by IP address.
+        Hints for all hosts are fetched in one query. An explicit profile_id
+        is used for every device regardless of its scope or recent failures.
+        """
+        self._require_key()
+        if profile_id:
+            profile = await self.profiles.find_one({'id': profile_id}, {'_id': 0})
+            chosen = [self._credentials(profile)] if profile else []
+            return {d['ip_address']: chosen for d in devices}
+        profiles = await self._load()
+
+        ips = list({d['ip_address'] for d in devices})
+        hints = {
+            h['ip_address']: h
+            async for h in self.hints.find({'ip_address': {'$in': ips}}, {'_id': 0})
+        }
+        now_iso = datetime.now(timezone.utc).isoformat()
+
+        result = {}
+        for device in devices:
+            ip_address = device['ip_address']
+            hint = hints.get(ip_address, {})
+            failures = hint.get('failures', {})
+            last_success = hint.get('last_success')
+
+            ranked = []
+            for profile in profiles:
+                if failures.get(profile['id'], '') > now_iso and profile['id'] != last_success:
+                    continue
+                key = self._specificity(profile, ip_address, device.get('device_type', ''))
+                if key is None:
+                    continue
+                known_good = 1 if profile['id'] == last_success else 0
+                ranked.append(((known_good, key, profile.get('priority', 0)), profile))
+
+            ranked.sort(key=lambda item: item[0], reverse=True)
+            result[ip_address] = [self._credentials(profile) for _, profile in ranked]
+        return result
+
+    async def record_result(self, ip_address: str, succeeded: Optional[str], failed: List[str]):
+        """Remember which profile worked for a host and which should be skipped for a while"""
+        update: Dict = {'$set': {'ip_address': ip_address, 'updated_at': datetime.now(timezone.utc).isoformat()}}
+        failed_until = (datetime.now(timezone.utc) + timedelta(seconds=self.failure_ttl)).isoformat()
+        for profile_id in failed:
+            update['$set'][f'failures.{profile_id}'] = failed_until
+        if succeeded:
+            update['$set']['last_success'] = succeeded
+            update['$unset'] = {f'failures.{succeeded}': ''}
+        await self.hints.update_one({'ip_address': ip_address}, update, upsert=True)
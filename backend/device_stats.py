@@ -0,0 +1,73 @@
+from typing import Dict, List, Optional
+
+# Number of buckets returned for high-cardinality facets
+TOP_N = 50
+
+
+def _count_by(field: str, limit: Optional[int] = None) -> List[Dict]:
+    """Pipeline stages counting documents grouped by a (possibly missing) field"""
+    stages = [
+        {'$group': {'_id': {'$ifNull': [f'${field}', 'Unknown']}, 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}},
+    ]
+    if limit:
+        stages.append({'$limit': limit})
+    return stages
+
+
+# Facet name -> aggregation stages run against the devices collection
+FACETS: Dict[str, List[Dict]] = {
+    'device_type': _count_by('device_type'),
+    'status': _count_by('status'),
+    'os_family': _count_by('os_info.os_family'),
+    'vendor': _count_by('os_info.vendor', TOP_N),
+    'services': [
+        {'$unwind': '$open_ports'},
+        {'$group': {'_id': '$open_ports.service', 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}},
+        {'$limit': TOP_N},
+    ],
+    'subnets': [
+        # IPv4 addresses are bucketed by /24; anything else is grouped as "other"
+        {'$project': {'octets': {'$split': ['$ip_address', '.']}}},
+        {'$project': {'subnet': {'$cond': [
+            {'$eq': [{'$size': '$octets'}, 4]},
+            {'$concat': [
+                {'$arrayElemAt': ['$octets', 0]}, '.',
+                {'$arrayElemAt': ['$octets', 1]}, '.',
+                {'$arrayElemAt': ['$octets', 2]}, '.0/24',
+            ]},
+            'other',
+        ]}}},
+        {'$group': {'_id': '$subnet', 'count': {'$sum': 1}}},
+        {'$sort': {'_id': 1}},
+    ],
+}
+
+
+async def collect_stats(collection, scan_id: Optional[str] = None, facets: Optional[List[str]] = None) -> Dict:
+    """
+    Compute dashboard counts server-side in a single aggregation round trip.
+
+    Args:
+        collection: Motor devices collection
+        scan_id: Optional scan to restrict the counts to
+        facets: Facet names to compute (defaults to all of FACETS)
+    """
+    names = facets or list(FACETS)
+    pipeline: List[Dict] = []
+    if scan_id:
+        pipeline.append({'$match': {'scan_id': scan_id}})
+    pipeline.append({'$facet': {
+        'total': [{'$count': 'count'}],
+        **{name: FACETS[name] for name in names},
+    }})
+
+    result = await collection.aggregate(pipeline).to_list(1)
+    buckets = result[0] if result else {}
+
+    total = buckets.get('total') or [{'count': 0}]
+    stats = {'scan_id': scan_id, 'total_devices': total[0]['count']}
+    for name in names:
+        stats[name] = {str(b['_id']): b['count'] for b in buckets.get(name, [])}
+    return stats
@@ -0,0 +1,278 @@
+import csv
+import io
+import json
+import logging
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Column order for tabular formats; nested values are stored as JSON text
+COLUMNS = [
+    'id', 'scan_id', 'ip_address', 'mac_address', 'hostname', 'device_type',
+    'status', 'discovered_at', 'authenticated', 'last_scanned', 'scan_error',
+    'os_info', 'hardware_specs', 'open_ports',
+    'attached_switch', 'switch_port', 'vlan', 'topology_updated_at',
+]
+JSON_COLUMNS = {'os_info', 'hardware_specs', 'open_ports'}
+INT_COLUMNS = {'vlan'}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+BATCH_SIZE = 1000
+
+
+async def iter_batches(collection, query: Dict, batch_size: int = BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+    """Read a Motor cursor in fixed-size batches"""
+    cursor = collection.find(query, {'_id': 0}).batch_size(batch_size)
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _to_row(device: Dict) -> Dict[str, Any]:
+    """Flatten a device document into a tabular row"""
+    row = {}
+    for column in COLUMNS:
+        value = device.get(column)
+        if column in JSON_COLUMNS and value is not None:
+            value = json.dumps(value, default=str)
+        row[column] = value
+    return row
+
+
+async def export_ndjson(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield ''.join(json.dumps(device, default=str) + '\n' for device in batch).encode('utf-8')
+
+
+async def export_csv(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    async for batch in batches:
+        writer.writerows(_to_row(device) for device in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    types = {'authenticated': pa.bool_(), 'vlan': pa.int64()}
+    return pa.schema([(column, types.get(column, pa.string())) for column in COLUMNS])
+
+
+async def export_parquet(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """Stream a Parquet file, one row group per cursor batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in batches:
+            rows = [_to_row(device) for device in batch]
+            for row in rows:
+                row['authenticated'] = bool(row['authenticated'])
+                for column in COLUMNS:
+                    if column in INT_COLUMNS and row[column] is not None:
+                        row[column] = int(row[column])
+                    elif column != 'authenticated' and row[column] is not None:
+                        row[column] = str(row[column])
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {
+    'ndjson': export_ndjson,
+    'csv': export_csv,
+    'parquet': export_parquet,
+}
+
+
+def normalize_device(record: Dict) -> Dict:
+    """Convert an imported record (possibly flattened) back into a device document"""
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    device = {}
+    for key, value in record.items():
+        if key not in COLUMNS:
+            continue
+        if value == '' or value is None:
+            value = None
+        elif key in JSON_COLUMNS and isinstance(value, str):
+            value = json.loads(value)
+        elif key in INT_COLUMNS and isinstance(value, str):
+            value = int(value)
+        elif key == 'authenticated' and isinstance(value, str):
+            value = value.strip().lower() in ('true', '1', 'yes')
+        device[key] = value
+
+    if not device.get('ip_address'):
+        raise ValueError("record has no ip_address")
+    device['id'] = device.get('id') or str(uuid.uuid4())
+    device['scan_id'] = device.get('scan_id') or 'import'
+    device['discovered_at'] = device.get('discovered_at') or datetime.now(timezone.utc).isoformat()
+    device['authenticated'] = bool(device.get('authenticated'))
+    if device.get('open_ports') is None:
+        device['open_ports'] = []
+    return device
+
+
+class BulkUpserter:
+    """Accumulates device upserts and flushes them with bulk_write"""
+
+    def __init__(self, collection, batch_size: int = BATCH_SIZE):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._pending: List[UpdateOne] = []
+        self.upserted = 0
+        self.modified = 0
+        self.errors: List[str] = []
+
+    async def add(self, record: Dict, line: Optional[int] = None):
+        try:
+            device = normalize_device(record)
+        except (ValueError, TypeError) as e:
+            # Keep the first few problems for the response without growing unbounded
+            if len(self.errors) < 100:
+                self.errors.append(f"record {line}: {str(e)}" if line else str(e))
+            return
+        self._pending.append(UpdateOne({'id': device['id']}, {'$set': device}, upsert=True))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def add_many(self, records: Iterable[Dict], first_line: int = 0):
+        for offset, record in enumerate(records):
+            await self.add(record, first_line + offset)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        result = await self.collection.bulk_write(self._pending, ordered=False)
+        self.upserted += result.upserted_count
+        self.modified += result.modified_count
+        self._pending = []
+
+    def summary(self) -> Dict:
+        return {'upserted': self.upserted, 'modified': self.modified, 'errors': self.errors}
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without buffering the whole body"""
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8')
+    if pending:
+        yield pending.decode('utf-8')
+
+
+async def import_ndjson(chunks: AsyncIterator[bytes], upserter: BulkUpserter):
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            if len(upserter.errors) < 100:
+                upserter.errors.append(f"record {line_number}: {str(e)}")
+            continue
+        await upserter.add(record, line_number)
+
+
+async def import_csv(chunks: AsyncIterator[bytes], upserter: BulkUpserter):
+    header: Optional[List[str]] = None
+    line_number = 0
+    record_lines: List[str] = []
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        record_lines.append(line)
+        # An odd number of quotes means a quoted field continues on the next line
+        if sum(part.count('"') for part in record_lines) % 2:
+            continue
+        text = '\n'.join(record_lines)
+        record_lines = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        await upserter.add(dict(zip(header, values)), line_number)
+
+
+async def import_parquet(chunks: AsyncIterator[bytes], upserter: BulkUpserter):
+    """Spool the upload to disk (Parquet needs its footer first) and read it by row group"""
+    import pyarrow.parquet as pq
+
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as spool:
+        async for chunk in chunks:
+            spool.write(chunk)
+        spool.seek(0)
+        row_number = 0
+        for batch in pq.ParquetFile(spool).iter_batches(batch_size=upserter.batch_size):
+            records = batch.to_pylist()
+            await upserter.add_many(records, row_number + 1)
+            row_number += len(records)
+
+
+IMPORTERS = {
+    'ndjson': import_ndjson,
+    'csv': import_csv,
+    'parquet': import_parquet,
+}
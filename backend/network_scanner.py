@@ -1,47 +1,127 @@
-import nmap
 import asyncio
+import copy
 import logging
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Tuple, Union
 import socket
 import subprocess
 import re
+import time
 from datetime import datetime, timezone
 import uuid
+from backends import Lazy, create_port_scanner, import_collector
+from scan_cache import ScanResultCache, credential_fingerprint
+from scan_targets import TargetSet
+from winrm_collector import WinRMCollector
+from metrics import (
+    NMAP_SECONDS, HOSTNAME_LOOKUP_SECONDS, ARP_LOOKUP_SECONDS,
+    COLLECTOR_SECONDS, COLLECTOR_FAILURES, HOSTS_DISCOVERED
+)
 
 logger = logging.getLogger(__name__)
 
+# nmap arguments for the detailed (OS + service) scan profile
+# -O: OS detection
+# -sV: Version detection
+# --top-ports: Scan most common ports
+DETAILED_SCAN_PROFILE = '-O -sV --top-ports 100 -T4'
+
+# nmap arguments for host discovery
+# -sn: Ping scan (no port scan)
+# -T4: Aggressive timing
+# --min-rate: Minimum packet rate
+DISCOVERY_PROFILE = '-sn -T4 --min-rate 100'
+
+# Fields a detailed scan produces; only these are cached and replayed onto
+# device records with the same address
+SCAN_RESULT_FIELDS = (
+    'os_info', 'open_ports', 'device_type', 'hardware_specs',
+    'authenticated', 'last_scanned', 'scan_error',
+)
+
+# CIDR blocks or addresses passed to a single nmap run
+DISCOVERY_BATCH_SIZE = 256
+
+# Larger IPv6 target sets are not swept address by address; candidates come
+# from the neighbour cache after an all-nodes multicast ping instead
+IPV6_SWEEP_LIMIT = 4096
+
 
 class NetworkScanner:
     """Network scanning utility for device discovery and inventory"""
     
-    def __init__(self):
-        self.nm = nmap.PortScanner()
+    def __init__(self, cache_ttl: float = 300.0, cache_size: int = 1024, port_scanner=None,
+                 winrm_collector: Optional[WinRMCollector] = None, backend: str = 'nmap'):
+        # The port scanner is built on first use from the backend registry,
+        # unless an instance (e.g. a test double) is injected
+        self._nm = Lazy(lambda: create_port_scanner(backend))
+        if port_scanner is not None:
+            self._nm.set(port_scanner)
+        self.winrm = winrm_collector or WinRMCollector()
+        self.result_cache = ScanResultCache(ttl=cache_ttl, max_entries=cache_size)
+    
+    @property
+    def nm(self):
+        return self._nm.get()
+    
+    async def prewarm(self, collectors: Iterable[str]) -> Dict[str, float]:
+        """
+        Build the port scanner ('nmap') and import collector dependencies
+        ahead of the first scan. Returns seconds spent per item; failures are
+        logged and skipped.
+        """
+        timings = {}
+        for name in collectors:
+            start = time.perf_counter()
+            try:
+                if name == 'nmap':
+                    await asyncio.to_thread(self._nm.get)
+                else:
+                    await asyncio.to_thread(import_collector, name)
+            except Exception as e:
+                logger.warning(f"Could not prewarm {name}: {str(e)}")
+                continue
+            timings[name] = round(time.perf_counter() - start, 3)
+            logger.info(f"Prewarmed {name} in {timings[name]}s")
+        return timings
     
-    async def discover_network(self, network_range: str, scan_id: str, progress_callback=None) -> List[Dict]:
+    async def discover_network(self, network_range: Union[str, TargetSet], scan_id: str,
+                               progress_callback=None) -> List[Dict]:
         """
         Perform initial network discovery without authentication.
         Returns list of discovered devices with basic info.
         
         Args:
-            network_range: CIDR notation (e.g., "192.168.1.0/24")
+            network_range: Targets, or a string of CIDRs, addresses or ranges
+                (e.g., "192.168.1.0/24, 2001:db8::1-2001:db8::ff")
             scan_id: Unique identifier for this scan
             progress_callback: Optional callback for progress updates
         """
         devices = []
+        targets = network_range if isinstance(network_range, TargetSet) else TargetSet.parse(network_range)
         
         try:
-            logger.info(f"Starting network scan for {network_range}")
+            logger.info(f"Starting network scan for {targets}")
             
-            # Perform host discovery scan
-            # -sn: Ping scan (no port scan)
-            # -T4: Aggressive timing
-            # --min-rate: Minimum packet rate
-            self.nm.scan(hosts=network_range, arguments='-sn -T4 --min-rate 100')
+            # Perform host discovery scan; targets are already disjoint, so
+            # every address is probed at most once
+            found = {}
+            neighbours = {}
+            if 4 in targets.versions:
+                found.update(await self._ping_sweep([str(n) for n in targets.networks(4)], DISCOVERY_PROFILE))
+            if 6 in targets.versions:
+                if targets.size(6) <= IPV6_SWEEP_LIMIT:
+                    hosts = [str(n) for n in targets.networks(6)]
+                else:
+                    neighbours = await self._ipv6_neighbours(targets)
+                    hosts = list(neighbours)
+                if hosts:
+                    found.update(await self._ping_sweep(hosts, f'-6 {DISCOVERY_PROFILE}'))
             
-            total_hosts = len(self.nm.all_hosts())
+            total_hosts = len(found)
+            HOSTS_DISCOVERED.inc(amount=total_hosts)
             processed = 0
             
-            for host in self.nm.all_hosts():
+            for host, host_data in found.items():
                 try:
                     device_info = {
                         'id': str(uuid.uuid4()),
@@ -52,7 +132,7 @@ class NetworkScanner:
                         'device_type': 'Unknown',
                         'os_info': None,
                         'hardware_specs': None,
-                        'status': 'up' if self.nm[host].state() == 'up' else 'down',
+                        'status': 'up' if host_data.state() == 'up' else 'down',
                         'discovered_at': datetime.now(timezone.utc).isoformat(),
                         'authenticated': False,
                         'open_ports': [],
@@ -60,17 +140,22 @@ class NetworkScanner:
                     
                     # Get hostname
                     try:
-                        device_info['hostname'] = self.nm[host].hostname()
+                        device_info['hostname'] = host_data.hostname()
                         if not device_info['hostname']:
                             # Try reverse DNS lookup
-                            device_info['hostname'] = socket.gethostbyaddr(host)[0]
+                            with HOSTNAME_LOOKUP_SECONDS.time():
+                                device_info['hostname'] = (await asyncio.to_thread(socket.gethostbyaddr, host))[0]
                     except Exception:
                         device_info['hostname'] = 'Unknown'
                     
                     # Get MAC address if available
-                    if 'addresses' in self.nm[host]:
-                        if 'mac' in self.nm[host]['addresses']:
-                            device_info['mac_address'] = self.nm[host]['addresses']['mac']
+                    if 'addresses' in host_data:
+                        if 'mac' in host_data['addresses']:
+                            device_info['mac_address'] = host_data['addresses']['mac']
+                    
+                    # IPv6 neighbours were resolved with their link-layer address
+                    if not device_info['mac_address']:
+                        device_info['mac_address'] = neighbours.get(host)
                     
                     # Try to get MAC from ARP (Linux)
                     if not device_info['mac_address']:
@@ -97,9 +182,76 @@ class NetworkScanner:
         
         return devices
     
-    async def detailed_scan(self, device: Dict, credentials: Optional[Dict] = None) -> Dict:
+    def _port_scanner(self):
+        """
+        A PortScanner of its own for one scan, so scans can run concurrently in
+        worker threads. Copying the shared instance reuses its nmap lookup.
+        """
+        return copy.copy(self.nm)
+    
+    async def _ping_sweep(self, hosts: List[str], arguments: str) -> Dict[str, Dict]:
+        """Run nmap host discovery over the targets in batches; returns host -> nmap host data"""
+        nm = self._port_scanner()
+        found = {}
+        for i in range(0, len(hosts), DISCOVERY_BATCH_SIZE):
+            with NMAP_SECONDS.time('discover'):
+                await asyncio.to_thread(nm.scan, hosts=' '.join(hosts[i:i + DISCOVERY_BATCH_SIZE]), arguments=arguments)
+            for host in nm.all_hosts():
+                found[host] = nm[host]
+        return found
+    
+    async def _ipv6_neighbours(self, targets: TargetSet) -> Dict[str, Optional[str]]:
+        """
+        IPv6 candidates for large prefixes: ping the all-nodes multicast group
+        on each interface (from every global source address, so hosts answer
+        from their global addresses too), then read the kernel neighbour cache.
+        Returns address -> MAC for neighbours inside the targets.
+        """
+        pings = []
+        try:
+            result = subprocess.run(['ip', '-o', '-6', 'addr', 'show'], capture_output=True, text=True, timeout=5)
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if len(parts) < 4 or parts[1] == 'lo':
+                    continue
+                interface, address = parts[1], parts[3].split('/')[0]
+                source = address if 'global' in parts else interface
+                pings.append(['ping', '-6', '-c', '2', '-w', '3', '-I', source, f'ff02::1%{interface}'])
+        except Exception as e:
+            logger.debug(f"Could not list IPv6 interfaces: {str(e)}")
+        
+        async def ping(command: List[str]):
+            process = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            await process.wait()
+        
+        await asyncio.gather(*(ping(command) for command in pings), return_exceptions=True)
+        
+        neighbours = {}
+        try:
+            result = subprocess.run(['ip', '-6', 'neigh', 'show'], capture_output=True, text=True, timeout=5)
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if not parts or parts[-1] in ('FAILED', 'INCOMPLETE') or not targets.contains(parts[0]):
+                    continue
+                # Link-local neighbours would need a zone id for nmap
+                if parts[0].lower().startswith('fe80:'):
+                    continue
+                mac = parts[parts.index('lladdr') + 1].upper() if 'lladdr' in parts else None
+                neighbours[parts[0]] = mac
+        except Exception as e:
+            logger.debug(f"Could not read the IPv6 neighbour cache: {str(e)}")
+        
+        logger.info(f"IPv6 neighbour discovery found {len(neighbours)} candidates")
+        return neighbours
+    
+    async def detailed_scan(self, device: Dict, credentials: Optional[Dict] = None,
+                            profile: str = DETAILED_SCAN_PROFILE, refresh: bool = False) -> Dict:
         """
         Perform detailed scan on a specific device with authentication.
+        Results are cached per (ip, profile, credential) and identical
+        concurrent requests share a single in-flight scan.
         
         Args:
             device: Device information dictionary
@@ -109,25 +261,80 @@ class NetworkScanner:
                     'password': str,
                     'auth_type': 'ssh' | 'snmp' | 'wmi'
                 }
+            profile: nmap arguments used for the OS/service scan
+            refresh: Ignore any cached result and rescan
         """
-        ip_address = device['ip_address']
+        key = (device['ip_address'], profile, credential_fingerprint(credentials))
+        
+        async def run_scan() -> Dict:
+            result = await self._detailed_scan(device, credentials, profile)
+            return {k: v for k, v in result.items() if k in SCAN_RESULT_FIELDS}
+        
+        def should_cache(fields: Dict) -> bool:
+            # A failed login is not cached, so a retry attempts it again
+            if credentials and not fields.get('authenticated'):
+                return False
+            return not fields.get('scan_error')
+        
+        scan_fields = await self.result_cache.get_or_compute(
+            key,
+            run_scan,
+            should_cache=should_cache,
+            refresh=refresh
+        )
+        
         detailed_info = device.copy()
+        detailed_info.update(scan_fields)
+        return detailed_info
+    
+    async def detailed_scan_with_candidates(self, device: Dict, candidates: List[Dict],
+                                            refresh: bool = False) -> Tuple[Dict, Optional[str], List[str]]:
+        """
+        Detailed scan trying vault credentials in order until one authenticates.
+        The OS/service scan runs once (cached as an anonymous scan); only the
+        collectors are repeated per candidate.
+        
+        Returns the device info, the profile id that worked (if any) and the
+        profile ids that failed.
+        """
+        detailed_info = await self.detailed_scan(device, None, refresh=refresh)
+        failed = []
+        if detailed_info.get('scan_error'):
+            return detailed_info, None, failed
+        
+        for credentials in candidates:
+            auth_info = await self._authenticated_scan(device['ip_address'], credentials)
+            if auth_info:
+                detailed_info.update(auth_info)
+                detailed_info['authenticated'] = True
+                return detailed_info, credentials['profile_id'], failed
+            failed.append(credentials['profile_id'])
+        
+        return detailed_info, None, failed
+    
+    async def _detailed_scan(self, device: Dict, credentials: Optional[Dict], profile: str) -> Dict:
+        """
+        Run the uncached OS/service scan and authenticated collectors.
+        Returns only what this scan produced; scan_error is None on success.
+        """
+        ip_address = device['ip_address']
+        detailed_info = {'scan_error': None}
         
         try:
             logger.info(f"Starting detailed scan for {ip_address}")
             
             # Perform OS detection and service scan
-            # -O: OS detection
-            # -sV: Version detection
-            # --top-ports: Scan most common ports
-            self.nm.scan(
-                hosts=ip_address,
-                arguments='-O -sV --top-ports 100 -T4',
-                sudo=True
-            )
+            nm = self._port_scanner()
+            with NMAP_SECONDS.time('detailed'):
+                await asyncio.to_thread(
+                    nm.scan,
+                    hosts=ip_address,
+                    arguments=f'-6 {profile}' if ':' in ip_address else profile,
+                    sudo=True
+                )
             
-            if ip_address in self.nm.all_hosts():
-                host_data = self.nm[ip_address]
+            if ip_address in nm.all_hosts():
+                host_data = nm[ip_address]
                 
                 # Get OS information
                 if 'osmatch' in host_data:
@@ -156,7 +363,7 @@ class NetworkScanner:
                 detailed_info['open_ports'] = open_ports
                 
                 # Update device type based on services
-                detailed_info['device_type'] = self._detect_device_type_advanced(detailed_info)
+                detailed_info['device_type'] = self._detect_device_type_advanced({**device, **detailed_info})
             
             # If credentials provided, attempt authenticated scan
             if credentials:
@@ -177,12 +384,14 @@ class NetworkScanner:
         """Get MAC address using ARP"""
         try:
             # Use arp command
-            result = subprocess.run(
-                ['arp', '-n', ip_address],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            with ARP_LOOKUP_SECONDS.time():
+                result = await asyncio.to_thread(
+                    subprocess.run,
+                    ['arp', '-n', ip_address],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
             
             if result.returncode == 0:
                 # Parse MAC address from output
@@ -259,27 +468,44 @@ class NetworkScanner:
         username = credentials.get('username')
         password = credentials.get('password')
         
+        # Keep label cardinality bounded for unrecognised auth types
+        protocol = auth_type if auth_type in ('ssh', 'snmp', 'wmi', 'ad') else 'other'
+        
+        result = None
         try:
-            if auth_type == 'ssh':
-                return await self._ssh_scan(ip_address, username, password)
-            elif auth_type == 'snmp':
-                return await self._snmp_scan(ip_address, credentials.get('community', username))
-            elif auth_type in ['wmi', 'ad']:
-                # WMI and AD use similar authentication
-                return await self._wmi_scan(ip_address, username, password)
+            with COLLECTOR_SECONDS.time(protocol):
+                if auth_type == 'ssh':
+                    result = await self._ssh_scan(ip_address, username, password)
+                elif auth_type == 'snmp':
+                    result = await self._snmp_scan(ip_address, credentials.get('community', username))
+                elif auth_type in ['wmi', 'ad']:
+                    # WMI and AD use similar authentication
+                    result = await self._wmi_scan(ip_address, username, password)
         except Exception as e:
             logger.error(f"Authenticated scan failed for {ip_address}: {str(e)}")
         
-        return None
+        if result is None:
+            COLLECTOR_FAILURES.inc(protocol)
+        return result
     
     async def _ssh_scan(self, ip_address: str, username: str, password: str) -> Optional[Dict]:
-        """Get hardware info via SSH"""
+        """Get hardware info via SSH (paramiko is blocking, so it runs in a worker thread)"""
         try:
-            import paramiko
-            
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            hardware_info = await asyncio.to_thread(self._ssh_collect, ip_address, username, password)
+            return {'hardware_specs': hardware_info}
             
+        except Exception as e:
+            logger.error(f"SSH scan failed for {ip_address}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _ssh_collect(ip_address: str, username: str, password: str) -> Dict:
+        import paramiko
+        
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        
+        try:
             # Connect with timeout
             client.connect(
                 ip_address,
@@ -293,41 +519,37 @@ class NetworkScanner:
             hardware_info = {}
             
             # Get CPU info
-            stdin, stdout, stderr = client.exec_command('lscpu 2>/dev/null || cat /proc/cpuinfo | head -20')
+            stdin, stdout, stderr = client.exec_command('lscpu 2>/dev/null || cat /proc/cpuinfo | head -20', timeout=30)
             cpu_output = stdout.read().decode('utf-8', errors='ignore')
             if cpu_output:
                 hardware_info['cpu'] = cpu_output[:500]  # Limit size
             
             # Get memory info
-            stdin, stdout, stderr = client.exec_command('free -h 2>/dev/null || cat /proc/meminfo | head -5')
+            stdin, stdout, stderr = client.exec_command('free -h 2>/dev/null || cat /proc/meminfo | head -5', timeout=30)
             mem_output = stdout.read().decode('utf-8', errors='ignore')
             if mem_output:
                 hardware_info['memory'] = mem_output[:500]
             
             # Get disk info
-            stdin, stdout, stderr = client.exec_command('df -h 2>/dev/null')
+            stdin, stdout, stderr = client.exec_command('df -h 2>/dev/null', timeout=30)
             disk_output = stdout.read().decode('utf-8', errors='ignore')
             if disk_output:
                 hardware_info['disk'] = disk_output[:1000]
             
             # Get OS release
-            stdin, stdout, stderr = client.exec_command('cat /etc/os-release 2>/dev/null || uname -a')
+            stdin, stdout, stderr = client.exec_command('cat /etc/os-release 2>/dev/null || uname -a', timeout=30)
             os_output = stdout.read().decode('utf-8', errors='ignore')
             if os_output:
                 hardware_info['os_release'] = os_output[:500]
             
+            return hardware_info
+        finally:
             client.close()
-            
-            return {'hardware_specs': hardware_info}
-            
-        except Exception as e:
-            logger.error(f"SSH scan failed for {ip_address}: {str(e)}")
-            return None
     
     async def _snmp_scan(self, ip_address: str, community: str) -> Optional[Dict]:
         """Get device info via SNMP"""
         try:
-            from pysnmp.hlapi.v3arch.asyncio import getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
+            from pysnmp.hlapi.v3arch.asyncio import get_cmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
             
             hardware_info = {}
             
@@ -335,17 +557,25 @@ class NetworkScanner:
             snmpEngine = SnmpEngine()
             
             # Get system description
-            errorIndication, errorStatus, errorIndex, varBinds = await getCmd(
-                snmpEngine,
-                CommunityData(community),
-                UdpTransportTarget((ip_address, 161), timeout=5, retries=1),
-                ContextData(),
-                ObjectType(ObjectIdentity('SNMPv2-MIB', 'sysDescr', 0))
-            )
+            try:
+                errorIndication, errorStatus, errorIndex, varBinds = await get_cmd(
+                    snmpEngine,
+                    CommunityData(community),
+                    await UdpTransportTarget.create((ip_address, 161), timeout=5, retries=1),
+                    ContextData(),
+                    ObjectType(ObjectIdentity('SNMPv2-MIB', 'sysDescr', 0))
+                )
+            finally:
+                # Release the engine's UDP socket
+                snmpEngine.close_dispatcher()
+            
+            if errorIndication or errorStatus:
+                # A timeout or wrong community string: this credential did not work
+                logger.debug(f"SNMP query failed for {ip_address}: {errorIndication or errorStatus.prettyPrint()}")
+                return None
             
-            if not errorIndication and not errorStatus:
-                for varBind in varBinds:
-                    hardware_info['system_description'] = str(varBind[1])
+            for varBind in varBinds:
+                hardware_info['system_description'] = str(varBind[1])
             
             return {'hardware_specs': hardware_info}
             
@@ -354,23 +584,10 @@ class NetworkScanner:
             return None
     
     async def _wmi_scan(self, ip_address: str, username: str, password: str) -> Optional[Dict]:
-        """Get Windows device info via WMI or Active Directory"""
-        # Note: This is a placeholder for WMI/AD authentication
-        # Full implementation would require pypsrp or pywinrm libraries
+        """Get Windows device info via WinRM (PowerShell/CIM)"""
         try:
-            # For now, return a message that WMI/AD scanning is in progress
-            logger.info(f"WMI/AD scan attempted for {ip_address} with user {username}")
-            
-            # Placeholder: In production, implement actual WMI queries here
-            # Example libraries: pypsrp, pywinrm
-            # This would query Windows systems for hardware info, installed software, etc.
-            
-            return {
-                'hardware_specs': {
-                    'scan_type': 'WMI/Active Directory',
-                    'note': 'WMI/AD authentication attempted - full implementation requires pywinrm/pypsrp'
-                }
-            }
+            hardware_info = await self.winrm.collect(ip_address, username, password)
+            return {'hardware_specs': hardware_info}
             
         except Exception as e:
             logger.error(f"WMI/AD scan failed for {ip_address}: {str(e)}")
@@ -379,10 +596,8 @@ class NetworkScanner:
 
 # Utility function to validate network range
 def validate_network_range(network_range: str) -> bool:
-    """Validate if network range is in valid CIDR notation"""
+    """Validate a comma separated list of CIDRs, addresses or ranges (IPv4 or IPv6)"""
     try:
-        import ipaddress
-        ipaddress.ip_network(network_range, strict=False)
-        return True
+        return bool(TargetSet.parse(network_range))
     except ValueError:
         return False
@@ -0,0 +1,149 @@
+import asyncio
+import copy
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def credential_fingerprint(credentials: Optional[Dict]) -> str:
+    """
+    Return a stable identifier for a credential set.
+    The secret itself is hashed so it never ends up in a cache key or log line.
+    """
+    if not credentials:
+        return 'anonymous'
+    if credentials.get('profile_id'):
+        # Vault profiles are immutable, so their id identifies the secret
+        return f"profile:{credentials['profile_id']}"
+
+    material = '\x00'.join(
+        str(credentials.get(field) or '')
+        for field in ('auth_type', 'username', 'password', 'community')
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+class ScanResultCache:
+    """
+    TTL + LRU cache for scan results with single-flight deduplication.
+
+    Concurrent callers asking for the same key while a computation is running
+    share that computation instead of starting their own.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Bumped by invalidate() so computations started before it are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a copy of the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """
+        Drop all entries, or only those whose key matches predicate.
+        In-flight computations are detached: their callers still get the
+        result, but it is not cached and later callers start afresh.
+        """
+        self._generation += 1
+        if predicate is None:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+        for key in [k for k in self._inflight if predicate(k)]:
+            del self._inflight[key]
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+        refresh: bool = False,
+    ) -> Any:
+        """
+        Return the cached value for key, computing it at most once at a time.
+
+        Args:
+            key: Cache key
+            compute: Coroutine factory producing the value on a miss
+            should_cache: Optional predicate deciding whether a result is stored
+            refresh: Skip the cache lookup (an in-flight computation is still shared)
+        """
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            logger.debug(f"Joining in-flight scan for {key}")
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            generation = self._generation
+
+            def _on_done(done: asyncio.Future):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+                if done.cancelled() or done.exception() is not None:
+                    return
+                if generation != self._generation:
+                    # Invalidated while computing; the result may be stale
+                    return
+                result = done.result()
+                if should_cache is None or should_cache(result):
+                    self.put(key, result)
+
+            task.add_done_callback(_on_done)
+
+        # Shield so a cancelled caller does not abort a scan others are waiting on
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters"""
+        return {
+            'entries': len(self._entries),
+            'inflight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+        }
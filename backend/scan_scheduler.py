@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+SCAN_TYPES = ('discovery', 'detailed')
+
+
+class CronExpression:
+    """
+    Minimal five-field cron expression (minute hour day-of-month month day-of-week).
+    Supports '*', lists, ranges and steps, plus the usual @daily style aliases.
+    """
+
+    _BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+
+        parsed = [self._parse_field(field, low, high) for field, (low, high) in zip(fields, self._BOUNDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Both 0 and 7 mean Sunday
+        self.weekdays = {d % 7 for d in weekdays}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values: Set[int] = set()
+        for part in field.split(','):
+            range_part, _, step_part = part.partition('/')
+            step = int(step_part) if step_part else 1
+            if range_part == '*':
+                start, end = low, high
+            elif '-' in range_part:
+                start, end = (int(v) for v in range_part.split('-', 1))
+            else:
+                start = int(range_part)
+                end = high if step_part else start
+            if step < 1 or start < low or end > high or start > end:
+                raise ValueError(f"Invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, t: datetime) -> bool:
+        day_ok = t.day in self.days
+        weekday_ok = (t.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both day fields are restricted either may match
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """Return the first matching minute strictly after the given time"""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+def next_run_time(cron: str, after: datetime, jitter_seconds: int = 0) -> datetime:
+    """Next fire time for a schedule, spread by a random jitter"""
+    run_at = CronExpression(cron).next_after(after)
+    if jitter_seconds > 0:
+        run_at += timedelta(seconds=random.uniform(0, jitter_seconds))
+    return run_at
+
+
+class ScanScheduler:
+    """
+    Fires scheduled discovery and detailed sweeps stored in Mongo.
+
+    Schedules are claimed with an atomic find_one_and_update, so a schedule
+    never runs twice at once, even across several backend replicas. A run that
+    comes due while the previous one is still going is skipped, and at most
+    max_concurrent scheduled scans run in this process at a time.
+    """
+
+    def __init__(
+        self,
+        collection,
+        runners: Dict[str, Callable[[Dict], Awaitable[None]]],
+        max_concurrent: int = 2,
+        poll_interval: float = 30.0,
+        stale_after: timedelta = timedelta(hours=12),
+    ):
+        self.collection = collection
+        self.runners = runners
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._running: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.ensure_future(self._loop())
+            logger.info(f"Scan scheduler started (max {self.max_concurrent} concurrent scans)")
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in list(self._running.values()):
+            task.cancel()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scan scheduler tick failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def tick(self, now: Optional[datetime] = None) -> List[str]:
+        """Start every due schedule the budget allows; returns the started schedule ids"""
+        now = now or datetime.now(timezone.utc)
+        now_iso = now.isoformat()
+        stale_iso = (now - self.stale_after).isoformat()
+        started = []
+
+        due = await self.collection.find(
+            {'enabled': True, 'next_run_at': {'$lte': now_iso}},
+            {'_id': 0}
+        ).sort('next_run_at', 1).to_list(100)
+
+        for schedule in due:
+            next_run = next_run_time(schedule['cron'], now, schedule.get('jitter_seconds', 0)).isoformat()
+
+            still_running = schedule['id'] in self._running or (
+                schedule.get('running') and schedule.get('running_since', '') > stale_iso
+            )
+            if still_running:
+                await self.collection.update_one(
+                    {'id': schedule['id'], 'next_run_at': schedule['next_run_at']},
+                    {'$set': {'next_run_at': next_run, 'last_status': 'skipped', 'last_skipped_at': now_iso}}
+                )
+                logger.info(f"Schedule {schedule['name']} skipped: previous run still in progress")
+                continue
+
+            if len(self._running) >= self.max_concurrent:
+                # Leave it due; it is picked up as soon as a slot frees
+                continue
+
+            claim = {'running': True, 'running_since': now_iso, 'next_run_at': next_run}
+            previous = await self.collection.find_one_and_update(
+                {
+                    'id': schedule['id'],
+                    'next_run_at': schedule['next_run_at'],
+                    '$or': [{'running': {'$ne': True}}, {'running_since': {'$lte': stale_iso}}],
+                },
+                {'$set': claim},
+                projection={'_id': 0}
+            )
+            if not previous:
+                # Another replica claimed it first
+                continue
+
+            self._running[schedule['id']] = asyncio.ensure_future(self._run({**previous, **claim}))
+            started.append(schedule['id'])
+
+        return started
+
+    async def _run(self, schedule: Dict):
+        status = 'completed'
+        error = None
+        try:
+            logger.info(f"Running scheduled {schedule['scan_type']} scan {schedule['name']} for {schedule['network_range']}")
+            await self.runners[schedule['scan_type']](schedule)
+        except Exception as e:
+            logger.error(f"Scheduled scan {schedule['name']} failed: {str(e)}")
+            status = 'failed'
+            error = str(e)
+        finally:
+            self._running.pop(schedule['id'], None)
+            await self.collection.update_one(
+                {'id': schedule['id']},
+                {'$set': {
+                    'running': False,
+                    'last_run_at': schedule['running_since'],
+                    'last_completed_at': datetime.now(timezone.utc).isoformat(),
+                    'last_status': status,
+                    'last_error': error,
+                }}
+            )
+
@@ -0,0 +1,179 @@
+import bisect
+import ipaddress
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Inclusive (first, last) address range as integers
+Interval = Tuple[int, int]
+
+
+def _address(text: str):
+    try:
+        return ipaddress.ip_address(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid address {text.strip()!r}") from None
+
+
+def parse_target(spec: str) -> Tuple[int, Interval]:
+    """
+    Parse one target into (ip version, interval). Accepts CIDRs, single
+    addresses and dashed ranges, including nmap's last-octet shorthand
+    (10.0.0.5-50).
+    """
+    spec = spec.strip()
+    if '/' in spec:
+        try:
+            network = ipaddress.ip_network(spec, strict=False)
+        except ValueError:
+            raise ValueError(f"Invalid network {spec!r}") from None
+        return network.version, (int(network.network_address), int(network.broadcast_address))
+
+    if '-' in spec:
+        left, right = spec.split('-', 1)
+        first = _address(left)
+        if first.version == 4 and right.strip().isdigit():
+            right = left.rsplit('.', 1)[0] + '.' + right.strip()
+        last = _address(right)
+        if first.version != last.version or int(first) > int(last):
+            raise ValueError(f"Invalid range {spec!r}")
+        return first.version, (int(first), int(last))
+
+    address = _address(spec)
+    return address.version, (int(address), int(address))
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort and merge overlapping or adjacent intervals"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals: List[Interval], removed: List[Interval]) -> List[Interval]:
+    """Remove one merged interval list from another"""
+    result = []
+    j = 0
+    for start, end in intervals:
+        while j < len(removed) and removed[j][1] < start:
+            j += 1
+        k = j
+        while start <= end and k < len(removed) and removed[k][0] <= end:
+            if removed[k][0] > start:
+                result.append((start, removed[k][0] - 1))
+            start = max(start, removed[k][1] + 1)
+            k += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+class TargetSet:
+    """
+    Scan targets as merged, non-overlapping address intervals per IP version.
+    Overlapping and adjacent inputs collapse, so every address is probed once.
+    """
+
+    def __init__(self, intervals: Dict[int, Iterable[Interval]] = None):
+        self._intervals: Dict[int, List[Interval]] = {}
+        for version, ranges in (intervals or {}).items():
+            merged = merge_intervals(ranges)
+            if merged:
+                self._intervals[version] = merged
+
+    @classmethod
+    def parse(cls, specs: Union[str, Iterable[str]]) -> 'TargetSet':
+        """Build a set from target strings; a single string may list several, comma separated"""
+        if isinstance(specs, str):
+            specs = [specs]
+        intervals: Dict[int, List[Interval]] = {}
+        for text in specs:
+            for spec in re.split(r'[,\s]+', text.strip()):
+                if spec:
+                    version, interval = parse_target(spec)
+                    intervals.setdefault(version, []).append(interval)
+        return cls(intervals)
+
+    def __sub__(self, other: 'TargetSet') -> 'TargetSet':
+        return TargetSet({
+            version: subtract_intervals(ranges, other._intervals.get(version, []))
+            for version, ranges in self._intervals.items()
+        })
+
+    def __or__(self, other: 'TargetSet') -> 'TargetSet':
+        versions = set(self._intervals) | set(other._intervals)
+        return TargetSet({
+            v: self._intervals.get(v, []) + other._intervals.get(v, []) for v in versions
+        })
+
+    def __and__(self, other: 'TargetSet') -> 'TargetSet':
+        return self - (self - other)
+
+    def __bool__(self) -> bool:
+        return bool(self._intervals)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TargetSet) and self._intervals == other._intervals
+
+    def __repr__(self) -> str:
+        return f"TargetSet({str(self)!r})"
+
+    def __str__(self) -> str:
+        return ', '.join(str(network) for network in self.networks())
+
+    @property
+    def versions(self) -> List[int]:
+        return sorted(self._intervals)
+
+    def intervals(self, version: int) -> List[Interval]:
+        return list(self._intervals.get(version, []))
+
+    def size(self, version: int = None) -> int:
+        """Number of addresses (may exceed 2**64 for IPv6)"""
+        versions = [version] if version else self._intervals
+        return sum(end - start + 1 for v in versions for start, end in self._intervals.get(v, []))
+
+    def contains(self, ip_address: str) -> bool:
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return False
+        ranges = self._intervals.get(address.version, [])
+        index = bisect.bisect_right(ranges, (int(address), float('inf'))) - 1
+        return index >= 0 and ranges[index][0] <= int(address) <= ranges[index][1]
+
+    def networks(self, version: int = None) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+        """The minimal CIDR blocks covering the set"""
+        address_class = {4: ipaddress.IPv4Address, 6: ipaddress.IPv6Address}
+        networks = []
+        for v in ([version] if version else self.versions):
+            for start, end in self._intervals.get(v, []):
+                networks.extend(ipaddress.summarize_address_range(address_class[v](start), address_class[v](end)))
+        return networks
+
+    def prefix_patterns(self, limit: int = 256) -> Optional[List[str]]:
+        """
+        Anchored regexes on dotted-quad prefixes matching a superset of the
+        set's addresses, so a Mongo query can narrow by ip_address with an
+        index before exact filtering. None when that cannot narrow anything
+        (IPv6 targets, prefixes shorter than /8, or too many patterns).
+        """
+        if 6 in self._intervals:
+            return None
+        patterns = set()
+        for network in self.networks(4):
+            octets = str(network.network_address).split('.')[:network.prefixlen // 8]
+            if not octets:
+                return None
+            pattern = '^' + r'\.'.join(octets)
+            patterns.add(pattern + ('$' if len(octets) == 4 else r'\.'))
+        # Drop patterns already covered by a shorter prefix
+        kept: List[str] = []
+        for pattern in sorted(patterns, key=len):
+            if not any(pattern.startswith(k) for k in kept if k.endswith(r'\.')):
+                kept.append(pattern)
+        return sorted(kept) if len(kept) <= limit else None
@@ -1,7 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
@@ -10,16 +10,33 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
 import asyncio
-from network_scanner import NetworkScanner, validate_network_range
+import re
+import pymongo
+from backends import LazyDatabase
+from network_scanner import SCAN_RESULT_FIELDS, NetworkScanner, validate_network_range
+from winrm_collector import WinRMCollector
+from metrics import Gauge, MONGO_WRITE_SECONDS, render_metrics
+from scan_cache import ScanResultCache
+from device_stats import FACETS, collect_stats
+from inventory_io import EXPORT_FORMATS, EXPORTERS, IMPORTERS, BulkUpserter, iter_batches
+from scan_scheduler import SCAN_TYPES, ScanScheduler, CronExpression, next_run_time
+from scan_targets import TargetSet
+from topology import TopologyCollector, store_topology
+from credential_vault import CredentialVault, VaultUnavailableError
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened on first use
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+db_name = os.environ['DB_NAME']
+
+def connect_database():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(mongo_url)[db_name]
+
+db = LazyDatabase(connect_database)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -27,16 +44,73 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Global scanner instance
-scanner = NetworkScanner()
+# SNMP neighbour/forwarding table collector
+topology_collector = TopologyCollector(
+    max_concurrent=int(os.environ.get('TOPOLOGY_MAX_CONCURRENT', '8'))
+)
+
+# Global scanner instance; nmap is located on the first scan (or by the prewarm hook)
+scanner = NetworkScanner(
+    backend=os.environ.get('SCANNER_BACKEND', 'nmap'),
+    cache_ttl=float(os.environ.get('SCAN_CACHE_TTL', '300')),
+    cache_size=int(os.environ.get('SCAN_CACHE_SIZE', '1024')),
+    winrm_collector=WinRMCollector(
+        transport=os.environ.get('WINRM_TRANSPORT', 'ntlm'),
+        use_https=os.environ.get('WINRM_USE_HTTPS', 'false').lower() == 'true',
+        server_cert_validation=os.environ.get('WINRM_CERT_VALIDATION', 'validate').lower(),
+        max_concurrent=int(os.environ.get('WINRM_MAX_CONCURRENT', '16')),
+        timeout=float(os.environ.get('WINRM_TIMEOUT', '60'))
+    )
+)
+
+# Encrypted credential profiles, matched to hosts by CIDR and device type
+vault = CredentialVault(
+    db.credential_profiles,
+    db.credential_hints,
+    key=os.environ.get('CREDENTIAL_VAULT_KEY'),
+    failure_ttl=float(os.environ.get('CREDENTIAL_FAILURE_TTL', '86400')),
+    profile_ttl=float(os.environ.get('CREDENTIAL_PROFILE_TTL', '10'))
+)
+
+# Equality filters of /devices/search that get an index in search order
+SEARCH_SORTED_FILTERS = (
+    'scan_id', 'device_type', 'os_info.os_family', 'status', 'open_ports.service', 'open_ports.port',
+)
+
+# Hosts a vault sweep scans at once
+DETAILED_SCAN_CONCURRENCY = int(os.environ.get('DETAILED_SCAN_CONCURRENCY', '16'))
 
 # Store active scans in memory
 active_scans: Dict[str, Dict[str, Any]] = {}
 
+# Targets of running discovery scans; overlapping requests skip these addresses
+inflight_targets: Dict[str, TargetSet] = {}
+
+# Dashboard aggregates, keyed by (scan_id, facet) and dropped whenever devices change
+stats_cache = ScanResultCache(
+    ttl=float(os.environ.get('STATS_CACHE_TTL', '60')),
+    max_entries=256
+)
+
+# Number of detailed scan background tasks currently running
+active_detailed_scans = 0
+
+# Scrape-time gauges for queue depth and active jobs
+Gauge('netinv_discovery_scans_running', 'Discovery scans currently running',
+      callback=lambda: sum(1 for s in active_scans.values() if s['status'] == 'running'))
+Gauge('netinv_detailed_scans_running', 'Detailed scan tasks currently running',
+      callback=lambda: active_detailed_scans)
+Gauge('netinv_scan_cache_entries', 'Entries in the detailed scan result cache',
+      callback=lambda: scanner.result_cache.stats()['entries'])
+Gauge('netinv_scan_cache_inflight', 'Detailed scans shared by concurrent requests',
+      callback=lambda: scanner.result_cache.stats()['inflight'])
+
 
 # Define Models
 class ScanRequest(BaseModel):
-    network_range: str
+    network_range: Optional[str] = None  # CIDR, address or range; several may be comma separated
+    targets: List[str] = []  # CIDRs, addresses or ranges, IPv4 or IPv6
+    exclude: List[str] = []
     
 class ScanResponse(BaseModel):
     scan_id: str
@@ -57,7 +131,36 @@ class DeviceCredentials(BaseModel):
 
 class DetailedScanRequest(BaseModel):
     device_id: str
-    credentials: DeviceCredentials
+    credentials: Optional[DeviceCredentials] = None  # omit to use vault profiles
+    credential_profile_id: Optional[str] = None  # pin a vault profile
+    force_refresh: bool = False  # bypass the scan result cache
+
+class BulkDetailedScanRequest(BaseModel):
+    device_ids: List[str] = []
+    network_range: Optional[str] = None  # every known device in the range
+    credential_profile_id: Optional[str] = None
+    force_refresh: bool = False
+
+class CredentialProfileRequest(BaseModel):
+    name: str
+    auth_type: str = 'ssh'  # ssh, snmp, wmi, ad
+    username: str = ''
+    password: str  # SNMP community string for snmp profiles
+    cidrs: List[str] = []  # empty matches every address
+    device_types: List[str] = []  # empty matches every device type
+    priority: int = 0
+
+class CredentialProfile(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    name: str
+    auth_type: str
+    username: str
+    cidrs: List[str]
+    device_types: List[str]
+    priority: int
+    created_at: str
 
 class Device(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -76,57 +179,132 @@ class Device(BaseModel):
     open_ports: List[Dict] = []
     last_scanned: Optional[str] = None
     scan_error: Optional[str] = None
+    attached_switch: Optional[str] = None
+    switch_port: Optional[str] = None
+    vlan: Optional[int] = None
+
+class ScheduleRequest(BaseModel):
+    name: str
+    network_range: str  # CIDRs, addresses or ranges, comma separated
+    exclude: List[str] = []
+    cron: str  # five-field cron expression or @hourly/@daily/@weekly/...
+    scan_type: str = 'discovery'  # discovery, detailed
+    jitter_seconds: int = Field(default=0, ge=0)
+    enabled: bool = True
+
+class Schedule(ScheduleRequest):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    created_at: str
+    next_run_at: str
+    running: bool = False
+    last_run_at: Optional[str] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+
+class TopologyRequest(BaseModel):
+    community: str = 'public'
+    switches: List[str] = []  # defaults to every known switch/router
+
+class DeviceSearchResponse(BaseModel):
+    devices: List[Device]
+    next_cursor: Optional[str] = None
+
+# Fields returned by the lightweight device list view
+SUMMARY_FIELDS = [
+    'id', 'scan_id', 'ip_address', 'mac_address', 'hostname',
+    'device_type', 'status', 'authenticated', 'last_scanned',
+]
 
 
 # Network Scanning Endpoints
 @api_router.post("/scan/discover", response_model=ScanResponse)
 async def start_network_scan(request: ScanRequest, background_tasks: BackgroundTasks):
-    """Start a network discovery scan"""
+    """Start a network discovery scan over one or more ranges, minus exclusions"""
     
-    # Validate network range
-    if not validate_network_range(request.network_range):
-        raise HTTPException(status_code=400, detail="Invalid network range. Use CIDR notation (e.g., 192.168.1.0/24)")
+    specs = ([request.network_range] if request.network_range else []) + request.targets
+    if not specs:
+        raise HTTPException(status_code=400, detail="Provide network_range or targets")
     
-    # Generate scan ID
-    scan_id = str(uuid.uuid4())
+    # Validate and normalize the targets
+    try:
+        targets = TargetSet.parse(specs) - TargetSet.parse(request.exclude)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{str(e)}. Use CIDR notation (e.g., 192.168.1.0/24), addresses or ranges (e.g., 10.0.0.5-10.0.0.50)"
+        )
+    if not targets:
+        raise HTTPException(status_code=400, detail="No addresses left to scan after exclusions")
+    
+    network_range = ', '.join(specs)
+    pending, overlaps = claim_targets(targets)
+    if not pending:
+        # Everything is already being probed; follow the scan that covers it
+        return ScanResponse(
+            scan_id=overlaps[0],
+            status='running',
+            message=f'{network_range} is already being scanned'
+        )
+    
+    scan_id = create_scan_record(network_range, pending, overlaps)
     
-    # Initialize scan status
+    # Start scan in background
+    background_tasks.add_task(perform_network_scan, scan_id, pending)
+    
+    message = f'Network scan started for {network_range}'
+    if overlaps:
+        message += f' (skipping {targets.size() - pending.size()} addresses already being scanned)'
+    return ScanResponse(scan_id=scan_id, status='started', message=message)
+
+def claim_targets(targets: TargetSet):
+    """
+    Split targets into those no running discovery scan covers and the ids of
+    the running scans that cover the rest
+    """
+    overlaps = [scan_id for scan_id, running in inflight_targets.items() if targets & running]
+    pending = targets
+    for scan_id in overlaps:
+        pending = pending - inflight_targets[scan_id]
+    return pending, overlaps
+
+def create_scan_record(network_range: str, targets: TargetSet, overlaps: Optional[List[str]] = None) -> str:
+    """Register a new discovery scan and claim its targets"""
+    scan_id = str(uuid.uuid4())
     active_scans[scan_id] = {
         'status': 'running',
         'progress': 0,
         'total_devices': 0,
         'devices': [],
-        'network_range': request.network_range,
+        'network_range': network_range,
+        'overlaps': overlaps or [],
         'started_at': datetime.now(timezone.utc).isoformat()
     }
-    
-    # Start scan in background
-    background_tasks.add_task(perform_network_scan, scan_id, request.network_range)
-    
-    return ScanResponse(
-        scan_id=scan_id,
-        status='started',
-        message=f'Network scan started for {request.network_range}'
-    )
+    inflight_targets[scan_id] = targets
+    return scan_id
 
-async def perform_network_scan(scan_id: str, network_range: str):
+async def perform_network_scan(scan_id: str, targets: TargetSet):
     """Background task for network scanning"""
+    network_range = active_scans[scan_id]['network_range']
     try:
         async def update_progress(progress: int):
             if scan_id in active_scans:
                 active_scans[scan_id]['progress'] = progress
         
         # Perform the scan
-        devices = await scanner.discover_network(network_range, scan_id, update_progress)
+        devices = await scanner.discover_network(targets, scan_id, update_progress)
         
         # Save devices to database
         if devices:
             for device in devices:
-                await db.devices.update_one(
-                    {'id': device['id']},
-                    {'$set': device},
-                    upsert=True
-                )
+                with MONGO_WRITE_SECONDS.time('device_upsert'):
+                    await db.devices.update_one(
+                        {'id': device['id']},
+                        {'$set': device},
+                        upsert=True
+                    )
+            stats_cache.invalidate()
         
         # Update scan status
         active_scans[scan_id]['status'] = 'completed'
@@ -136,19 +314,23 @@ async def perform_network_scan(scan_id: str, network_range: str):
         active_scans[scan_id]['completed_at'] = datetime.now(timezone.utc).isoformat()
         
         # Save scan record
-        await db.scans.insert_one({
-            'scan_id': scan_id,
-            'network_range': network_range,
-            'total_devices': len(devices),
-            'status': 'completed',
-            'started_at': active_scans[scan_id]['started_at'],
-            'completed_at': active_scans[scan_id]['completed_at']
-        })
+        with MONGO_WRITE_SECONDS.time('scan_insert'):
+            await db.scans.insert_one({
+                'scan_id': scan_id,
+                'network_range': network_range,
+                'overlaps': active_scans[scan_id]['overlaps'],
+                'total_devices': len(devices),
+                'status': 'completed',
+                'started_at': active_scans[scan_id]['started_at'],
+                'completed_at': active_scans[scan_id]['completed_at']
+            })
         
     except Exception as e:
         logging.error(f"Scan failed: {str(e)}")
         active_scans[scan_id]['status'] = 'failed'
         active_scans[scan_id]['error'] = str(e)
+    finally:
+        inflight_targets.pop(scan_id, None)
 
 @api_router.get("/scan/status/{scan_id}", response_model=ScanStatus)
 async def get_scan_status(scan_id: str):
@@ -167,17 +349,171 @@ async def get_scan_status(scan_id: str):
         message=scan_data.get('error', 'Scan in progress' if scan_data['status'] == 'running' else 'Scan completed')
     )
 
+def build_projection(view: str, fields: Optional[str]) -> Optional[Dict[str, int]]:
+    """Return the Mongo projection for a device list view, or None for full documents"""
+    if fields:
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in Device.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown device fields: {', '.join(unknown)}")
+    elif view == 'summary':
+        requested = SUMMARY_FIELDS
+    elif view == 'full':
+        return None
+    else:
+        raise HTTPException(status_code=400, detail="Invalid view. Use 'full' or 'summary'")
+    
+    projection = {field: 1 for field in requested}
+    projection['id'] = 1
+    projection['_id'] = 0
+    return projection
+
 @api_router.get("/devices", response_model=List[Device])
-async def get_devices(scan_id: Optional[str] = None):
-    """Get all discovered devices, optionally filtered by scan_id"""
+async def get_devices(scan_id: Optional[str] = None, view: str = 'full', fields: Optional[str] = None):
+    """
+    Get all discovered devices, optionally filtered by scan_id.
+    Use view=summary or fields=a,b,c to fetch only some fields; these
+    partial views skip model validation and are returned as stored.
+    """
     
     query = {}
     if scan_id:
         query['scan_id'] = scan_id
     
+    projection = build_projection(view, fields)
+    if projection is not None:
+        devices = await db.devices.find(query, projection).sort('ip_address', 1).to_list(1000)
+        return JSONResponse(devices)
+    
     devices = await db.devices.find(query, {"_id": 0}).sort('ip_address', 1).to_list(1000)
     return devices
 
+def build_search_query(q: Optional[str] = None, hostname: Optional[str] = None, mac: Optional[str] = None,
+                       ports: Optional[List[int]] = None, service: Optional[str] = None,
+                       os_family: Optional[str] = None, device_type: Optional[str] = None,
+                       status: Optional[str] = None, scan_id: Optional[str] = None,
+                       cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Mongo filter for a device search; cursor is the 'ip|id' of the last device on the previous page"""
+    query: Dict[str, Any] = {}
+    if q:
+        query['$text'] = {'$search': q}
+    if hostname:
+        # Anchored, case-sensitive prefix so the hostname index is used
+        query['hostname'] = {'$regex': '^' + re.escape(hostname)}
+    if mac:
+        normalized = mac.replace('-', ':')
+        query['mac_address'] = {'$in': [normalized.upper(), normalized.lower()]}
+    if ports:
+        query['open_ports.port'] = {'$all': ports}
+    if service:
+        query['open_ports.service'] = service
+    if os_family:
+        query['os_info.os_family'] = os_family
+    if device_type:
+        query['device_type'] = device_type
+    if status:
+        query['status'] = status
+    if scan_id:
+        query['scan_id'] = scan_id
+    
+    if cursor:
+        after_ip, _, after_id = cursor.partition('|')
+        query['$or'] = [
+            {'ip_address': {'$gt': after_ip}},
+            {'ip_address': after_ip, 'id': {'$gt': after_id}},
+        ]
+    return query
+
+@api_router.get("/devices/search", response_model=DeviceSearchResponse)
+async def search_devices(
+    q: Optional[str] = None,
+    hostname: Optional[str] = None,
+    mac: Optional[str] = None,
+    ports: Optional[List[int]] = Query(None, alias='port'),
+    service: Optional[str] = None,
+    os_family: Optional[str] = None,
+    device_type: Optional[str] = None,
+    status: Optional[str] = None,
+    scan_id: Optional[str] = None,
+    view: str = 'full',
+    fields: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """
+    Search devices using indexed filters. All filters are combined.
+    
+    q matches words in hostname, OS name and service names/products,
+    hostname is a prefix match, and every given port must be open.
+    Results are ordered by IP address; pass next_cursor back as cursor
+    to fetch the following page.
+    """
+    
+    query = build_search_query(
+        q=q, hostname=hostname, mac=mac, ports=ports, service=service, os_family=os_family,
+        device_type=device_type, status=status, scan_id=scan_id, cursor=cursor
+    )
+    
+    projection = build_projection(view, fields)
+    find_projection = dict(projection) if projection is not None else {"_id": 0}
+    # The cursor is built from these even when the caller did not ask for them
+    extra_fields = [f for f in ('ip_address', 'id') if projection is not None and f not in projection]
+    for field in extra_fields:
+        find_projection[field] = 1
+    
+    devices = await db.devices.find(query, find_projection) \
+        .sort([('ip_address', 1), ('id', 1)]) \
+        .limit(limit) \
+        .to_list(limit)
+    
+    next_cursor = None
+    if len(devices) == limit:
+        next_cursor = f"{devices[-1]['ip_address']}|{devices[-1]['id']}"
+    
+    if projection is not None:
+        for device in devices:
+            for field in extra_fields:
+                device.pop(field, None)
+        return JSONResponse({'devices': devices, 'next_cursor': next_cursor})
+    
+    return {'devices': devices, 'next_cursor': next_cursor}
+
+@api_router.get("/devices/export")
+async def export_devices(format: str = 'ndjson', scan_id: Optional[str] = None):
+    """Stream the full inventory as NDJSON, CSV or Parquet"""
+    
+    if format not in EXPORTERS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(EXPORTERS)}")
+    
+    query = {}
+    if scan_id:
+        query['scan_id'] = scan_id
+    
+    return StreamingResponse(
+        EXPORTERS[format](iter_batches(db.devices, query)),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="devices.{format}"'}
+    )
+
+@api_router.post("/devices/import")
+async def import_devices(request: Request, format: str = 'ndjson'):
+    """Bulk upsert devices from an NDJSON, CSV or Parquet request body"""
+    
+    if format not in IMPORTERS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(IMPORTERS)}")
+    
+    upserter = BulkUpserter(db.devices)
+    try:
+        await IMPORTERS[format](request.stream(), upserter)
+        await upserter.flush()
+    except Exception as e:
+        logging.error(f"Device import failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Import failed: {str(e)}")
+    finally:
+        stats_cache.invalidate()
+    
+    return upserter.summary()
+
 @api_router.get("/devices/{device_id}", response_model=Device)
 async def get_device(device_id: str):
     """Get details of a specific device"""
@@ -191,7 +527,7 @@ async def get_device(device_id: str):
 
 @api_router.post("/scan/detailed")
 async def start_detailed_scan(request: DetailedScanRequest, background_tasks: BackgroundTasks):
-    """Start a detailed scan for a specific device with credentials"""
+    """Start a detailed scan for a specific device with credentials or vault profiles"""
     
     # Get device from database
     device = await db.devices.find_one({'id': request.device_id}, {"_id": 0})
@@ -200,28 +536,45 @@ async def start_detailed_scan(request: DetailedScanRequest, background_tasks: Ba
         raise HTTPException(status_code=404, detail="Device not found")
     
     # Start detailed scan in background
-    background_tasks.add_task(
-        perform_detailed_scan,
-        device,
-        request.credentials.model_dump()
-    )
+    if request.credentials:
+        background_tasks.add_task(
+            perform_detailed_scan,
+            device,
+            request.credentials.model_dump(),
+            request.force_refresh
+        )
+    else:
+        if not vault.enabled:
+            raise HTTPException(status_code=400, detail="Provide credentials or configure CREDENTIAL_VAULT_KEY")
+        if request.credential_profile_id and not await vault.get_profile(request.credential_profile_id):
+            raise HTTPException(status_code=404, detail="Credential profile not found")
+        background_tasks.add_task(
+            perform_vault_scan,
+            [device],
+            request.credential_profile_id,
+            request.force_refresh
+        )
     
     return {
         'message': f'Detailed scan started for {device["ip_address"]}',
         'device_id': request.device_id
     }
 
-async def perform_detailed_scan(device: Dict, credentials: Dict):
+async def perform_detailed_scan(device: Dict, credentials: Dict, force_refresh: bool = False):
     """Background task for detailed device scanning"""
+    global active_detailed_scans
+    active_detailed_scans += 1
     try:
-        # Perform detailed scan
-        detailed_info = await scanner.detailed_scan(device, credentials)
+        # Perform detailed scan (served from cache for repeated requests)
+        detailed_info = await scanner.detailed_scan(device, credentials, refresh=force_refresh)
         
         # Update device in database
-        await db.devices.update_one(
-            {'id': device['id']},
-            {'$set': detailed_info}
-        )
+        with MONGO_WRITE_SECONDS.time('device_update'):
+            await db.devices.update_one(
+                {'id': device['id']},
+                {'$set': detailed_info}
+            )
+        stats_cache.invalidate()
         
     except Exception as e:
         logging.error(f"Detailed scan failed: {str(e)}")
@@ -229,6 +582,102 @@ async def perform_detailed_scan(device: Dict, credentials: Dict):
             {'id': device['id']},
             {'$set': {'scan_error': str(e)}}
         )
+    finally:
+        active_detailed_scans -= 1
+
+@api_router.post("/scan/detailed/bulk")
+async def start_bulk_detailed_scan(request: BulkDetailedScanRequest, background_tasks: BackgroundTasks):
+    """Start detailed scans for many devices with credentials matched from the vault"""
+    
+    if not vault.enabled:
+        raise HTTPException(status_code=400, detail="Credential vault is disabled: set CREDENTIAL_VAULT_KEY")
+    if not request.device_ids and not request.network_range:
+        raise HTTPException(status_code=400, detail="Provide device_ids or network_range")
+    if request.network_range and not validate_network_range(request.network_range):
+        raise HTTPException(status_code=400, detail="Invalid network range format")
+    if request.credential_profile_id and not await vault.get_profile(request.credential_profile_id):
+        raise HTTPException(status_code=404, detail="Credential profile not found")
+    
+    targets = TargetSet.parse(request.network_range) if request.network_range else None
+    if request.device_ids:
+        devices = [
+            device async for device in db.devices.find({'id': {'$in': request.device_ids}}, {"_id": 0})
+            if targets is None or targets.contains(device['ip_address'])
+        ]
+    else:
+        devices = await latest_devices_in(targets)
+    
+    background_tasks.add_task(
+        perform_vault_scan,
+        devices,
+        request.credential_profile_id,
+        request.force_refresh
+    )
+    
+    return {
+        'message': f'Detailed scan started for {len(devices)} devices',
+        'devices': len(devices)
+    }
+
+async def perform_vault_scan(devices: List[Dict], profile_id: Optional[str] = None, force_refresh: bool = False):
+    """
+    Background task for detailed scans using vault credentials.
+    Each host tries its last working profile first and skips profiles that
+    recently failed against it. Records sharing an IP are scanned and
+    authenticated once, using the most recently discovered one; up to
+    DETAILED_SCAN_CONCURRENCY hosts are scanned at a time.
+    """
+    by_ip: Dict[str, List[Dict]] = {}
+    for device in devices:
+        by_ip.setdefault(device['ip_address'], []).append(device)
+    hosts = [max(records, key=lambda d: d.get('discovered_at') or '') for records in by_ip.values()]
+    
+    try:
+        candidates = await vault.candidates(hosts, profile_id)
+    except Exception as e:
+        logging.error(f"Could not load credential profiles: {str(e)}")
+        return
+    
+    semaphore = asyncio.Semaphore(DETAILED_SCAN_CONCURRENCY)
+    
+    async def scan_host(device: Dict):
+        async with semaphore:
+            await scan_host_records(
+                device, [record['id'] for record in by_ip[device['ip_address']]],
+                candidates[device['ip_address']], force_refresh
+            )
+    
+    await asyncio.gather(*(scan_host(device) for device in hosts))
+
+async def scan_host_records(device: Dict, device_ids: List[str], candidates: List[Dict], force_refresh: bool):
+    """Scan one host with its vault candidates and store the result on all its records"""
+    global active_detailed_scans
+    ip_address = device['ip_address']
+    active_detailed_scans += 1
+    try:
+        detailed_info, succeeded, failed = await scanner.detailed_scan_with_candidates(
+            device, candidates, refresh=force_refresh
+        )
+        if succeeded or failed:
+            await vault.record_result(ip_address, succeeded, failed)
+        
+        # Only the scan output is shared; ids and discovery fields stay per record
+        scan_fields = {k: v for k, v in detailed_info.items() if k in SCAN_RESULT_FIELDS}
+        with MONGO_WRITE_SECONDS.time('device_update'):
+            await db.devices.update_many(
+                {'id': {'$in': device_ids}},
+                {'$set': scan_fields}
+            )
+        stats_cache.invalidate()
+        
+    except Exception as e:
+        logging.error(f"Detailed scan failed for {ip_address}: {str(e)}")
+        await db.devices.update_many(
+            {'id': {'$in': device_ids}},
+            {'$set': {'scan_error': str(e)}}
+        )
+    finally:
+        active_detailed_scans -= 1
 
 @api_router.delete("/devices/{device_id}")
 async def delete_device(device_id: str):
@@ -239,6 +688,7 @@ async def delete_device(device_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Device not found")
     
+    stats_cache.invalidate()
     return {'message': 'Device deleted successfully'}
 
 @api_router.get("/scans")
@@ -248,6 +698,238 @@ async def get_scan_history():
     scans = await db.scans.find({}, {"_id": 0}).sort('started_at', -1).to_list(100)
     return scans
 
+@api_router.get("/stats")
+async def get_stats(scan_id: Optional[str] = None):
+    """Get device counts by type, status, OS family, vendor, service and subnet"""
+    
+    return await stats_cache.get_or_compute(
+        (scan_id, 'all'),
+        lambda: collect_stats(db.devices, scan_id)
+    )
+
+@api_router.get("/stats/{facet}")
+async def get_stats_facet(facet: str, scan_id: Optional[str] = None):
+    """Get device counts for a single dashboard facet"""
+    
+    if facet not in FACETS:
+        raise HTTPException(status_code=404, detail=f"Unknown facet. Use one of: {', '.join(FACETS)}")
+    
+    return await stats_cache.get_or_compute(
+        (scan_id, facet),
+        lambda: collect_stats(db.devices, scan_id, [facet])
+    )
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose scan pipeline metrics in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type='text/plain; version=0.0.4')
+
+# Scheduled scans
+async def run_scheduled_discovery(schedule: Dict):
+    """Scheduler runner for discovery sweeps"""
+    targets = TargetSet.parse(schedule['network_range']) - TargetSet.parse(schedule.get('exclude', []))
+    pending, overlaps = claim_targets(targets)
+    if not pending:
+        logger.info(f"Schedule {schedule['name']} skipped: range already being scanned")
+        return
+    scan_id = create_scan_record(schedule['network_range'], pending, overlaps)
+    await perform_network_scan(scan_id, pending)
+    if active_scans[scan_id]['status'] == 'failed':
+        raise RuntimeError(active_scans[scan_id].get('error', 'Scan failed'))
+
+async def latest_devices_in(targets: TargetSet) -> List[Dict]:
+    """The most recently discovered record for each address inside the targets"""
+    pipeline = []
+    patterns = targets.prefix_patterns()
+    if patterns is not None:
+        pipeline.append({'$match': {'$or': [{'ip_address': {'$regex': p}} for p in patterns]}})
+    pipeline += [
+        {'$sort': {'ip_address': 1, 'discovered_at': -1}},
+        {'$group': {'_id': '$ip_address', 'device': {'$first': '$$ROOT'}}},
+        {'$replaceRoot': {'newRoot': '$device'}},
+        {'$project': {'_id': 0}},
+    ]
+    return [
+        device async for device in db.devices.aggregate(pipeline, allowDiskUse=True)
+        if targets.contains(device['ip_address'])
+    ]
+
+async def run_scheduled_detailed(schedule: Dict):
+    """Scheduler runner for detailed sweeps over known devices in the range"""
+    targets = TargetSet.parse(schedule['network_range']) - TargetSet.parse(schedule.get('exclude', []))
+    devices = await latest_devices_in(targets)
+    if vault.enabled:
+        await perform_vault_scan(devices)
+    else:
+        for device in devices:
+            await perform_detailed_scan(device, None)
+
+scheduler = ScanScheduler(
+    db.scan_schedules,
+    runners={'discovery': run_scheduled_discovery, 'detailed': run_scheduled_detailed},
+    max_concurrent=int(os.environ.get('SCHEDULER_MAX_CONCURRENT_SCANS', '2')),
+    poll_interval=float(os.environ.get('SCHEDULER_POLL_SECONDS', '30'))
+)
+
+def validate_schedule(request: ScheduleRequest):
+    if not validate_network_range(request.network_range):
+        raise HTTPException(status_code=400, detail="Invalid network range. Use CIDRs (e.g., 192.168.1.0/24), addresses or ranges")
+    if request.exclude and not all(validate_network_range(spec) for spec in request.exclude):
+        raise HTTPException(status_code=400, detail="Invalid exclusion")
+    if request.scan_type not in SCAN_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid scan type. Use one of: {', '.join(SCAN_TYPES)}")
+    try:
+        # A well-formed expression may still never fire (e.g. 0 0 30 2 *)
+        CronExpression(request.cron).next_after(datetime.now(timezone.utc))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/schedules", response_model=List[Schedule])
+async def get_schedules():
+    """List scan schedules"""
+    
+    return await scheduler.collection.find({}, {"_id": 0}).sort('name', 1).to_list(1000)
+
+@api_router.post("/schedules", response_model=Schedule)
+async def create_schedule(request: ScheduleRequest):
+    """Create a recurring scan schedule"""
+    
+    validate_schedule(request)
+    now = datetime.now(timezone.utc)
+    schedule = {
+        **request.model_dump(),
+        'id': str(uuid.uuid4()),
+        'created_at': now.isoformat(),
+        'next_run_at': next_run_time(request.cron, now, request.jitter_seconds).isoformat(),
+        'running': False,
+    }
+    await scheduler.collection.insert_one(schedule)
+    schedule.pop('_id', None)
+    return schedule
+
+@api_router.put("/schedules/{schedule_id}", response_model=Schedule)
+async def update_schedule(schedule_id: str, request: ScheduleRequest):
+    """Replace a schedule's settings and recompute its next run"""
+    
+    validate_schedule(request)
+    now = datetime.now(timezone.utc)
+    schedule = await scheduler.collection.find_one_and_update(
+        {'id': schedule_id},
+        {'$set': {
+            **request.model_dump(),
+            'next_run_at': next_run_time(request.cron, now, request.jitter_seconds).isoformat(),
+        }},
+        projection={"_id": 0},
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return schedule
+
+@api_router.delete("/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: str):
+    """Delete a scan schedule"""
+    
+    result = await scheduler.collection.delete_one({'id': schedule_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return {'message': 'Schedule deleted successfully'}
+
+# Credential vault
+@api_router.get("/credentials", response_model=List[CredentialProfile])
+async def get_credential_profiles():
+    """List vault credential profiles (secrets are never returned)"""
+    return await vault.list_profiles()
+
+@api_router.post("/credentials", response_model=CredentialProfile)
+async def create_credential_profile(request: CredentialProfileRequest):
+    """Store an encrypted credential profile"""
+    
+    try:
+        return await vault.create_profile(
+            request.name, request.auth_type, request.username, request.password,
+            request.cidrs, request.device_types, request.priority
+        )
+    except VaultUnavailableError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CIDR: {str(e)}")
+
+@api_router.delete("/credentials/{profile_id}")
+async def delete_credential_profile(profile_id: str):
+    """Delete a credential profile"""
+    
+    if not await vault.delete_profile(profile_id):
+        raise HTTPException(status_code=404, detail="Credential profile not found")
+    
+    return {'message': 'Credential profile deleted successfully'}
+
+# Topology
+@api_router.post("/topology/discover")
+async def start_topology_discovery(request: TopologyRequest, background_tasks: BackgroundTasks):
+    """Walk LLDP/CDP and bridge tables on switches and attach devices to switch ports"""
+    
+    switches = request.switches
+    if not switches:
+        switches = await db.devices.distinct(
+            'ip_address',
+            {'device_type': {'$in': ['Switch', 'Router', 'Router/Firewall']}}
+        )
+    if not switches:
+        raise HTTPException(status_code=400, detail="No switches given and none found in the inventory")
+    
+    background_tasks.add_task(perform_topology_discovery, switches, request.community)
+    return {'message': f'Topology discovery started for {len(switches)} switches'}
+
+async def perform_topology_discovery(switches: List[str], community: str):
+    """Background task for topology collection"""
+    try:
+        collected = await topology_collector.collect(switches, community)
+        summary = await store_topology(db, collected)
+        stats_cache.invalidate()
+        logger.info(f"Topology discovery completed: {summary}")
+    except Exception as e:
+        logging.error(f"Topology discovery failed: {str(e)}")
+
+@api_router.get("/topology")
+async def get_topology(switch: Optional[str] = None, include_devices: bool = True):
+    """Get the switch adjacency graph and, optionally, which port each device sits on"""
+    
+    query = {'ip_address': switch} if switch else {}
+    switches = await db.topology.find(query, {"_id": 0}).to_list(1000)
+    
+    nodes = {s['ip_address']: {'id': s['ip_address'], 'type': 'switch', 'name': s.get('sys_name')} for s in switches}
+    links = []
+    for s in switches:
+        for neighbour in s.get('neighbours', []):
+            remote = neighbour.get('remote_address') or neighbour.get('remote_name') or neighbour['remote_id']
+            nodes.setdefault(remote, {'id': remote, 'type': 'neighbour', 'name': neighbour.get('remote_name')})
+            links.append({
+                'source': s['ip_address'],
+                'source_port': neighbour['local_port'],
+                'target': remote,
+                'target_port': neighbour.get('remote_port'),
+                'protocol': neighbour['protocol'],
+            })
+    
+    if include_devices:
+        device_query = {'attached_switch': switch} if switch else {'attached_switch': {'$ne': None}}
+        cursor = db.devices.find(device_query, {
+            "_id": 0, 'id': 1, 'ip_address': 1, 'hostname': 1, 'attached_switch': 1, 'switch_port': 1, 'vlan': 1
+        })
+        async for device in cursor:
+            nodes.setdefault(device['id'], {'id': device['id'], 'type': 'device', 'name': device.get('hostname'),
+                                            'ip_address': device['ip_address']})
+            links.append({
+                'source': device['attached_switch'],
+                'source_port': device.get('switch_port'),
+                'target': device['id'],
+                'vlan': device.get('vlan'),
+                'protocol': 'fdb',
+            })
+    
+    return {'nodes': list(nodes.values()), 'links': links}
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -271,6 +953,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def ensure_indexes():
+    """Create the indexes backing device lookups, search and stats"""
+    try:
+        await db.devices.create_indexes([
+            pymongo.IndexModel([('id', pymongo.ASCENDING)], unique=True),
+            pymongo.IndexModel([('ip_address', pymongo.ASCENDING), ('id', pymongo.ASCENDING)]),
+            pymongo.IndexModel([('hostname', pymongo.ASCENDING)]),
+            pymongo.IndexModel([('mac_address', pymongo.ASCENDING)]),
+            # Equality filter, then the (ip_address, id) search order, so a
+            # filtered page is read in order instead of sorted in memory
+            *(
+                pymongo.IndexModel([(field, pymongo.ASCENDING), ('ip_address', pymongo.ASCENDING),
+                                    ('id', pymongo.ASCENDING)])
+                for field in SEARCH_SORTED_FILTERS
+            ),
+            pymongo.IndexModel([('attached_switch', pymongo.ASCENDING)], sparse=True),
+            pymongo.IndexModel(
+                [('hostname', pymongo.TEXT), ('os_info.name', pymongo.TEXT),
+                 ('open_ports.service', pymongo.TEXT), ('open_ports.product', pymongo.TEXT)],
+                name='device_text',
+                default_language='none'
+            ),
+        ])
+        await db.scans.create_index([('started_at', pymongo.DESCENDING)])
+        await db.topology.create_index([('ip_address', pymongo.ASCENDING)], unique=True)
+        await db.scan_schedules.create_indexes([
+            pymongo.IndexModel([('id', pymongo.ASCENDING)], unique=True),
+            pymongo.IndexModel([('enabled', pymongo.ASCENDING), ('next_run_at', pymongo.ASCENDING)]),
+        ])
+        await db.credential_profiles.create_index([('id', pymongo.ASCENDING)], unique=True)
+        await db.credential_hints.create_index([('ip_address', pymongo.ASCENDING)], unique=True)
+    except Exception as e:
+        logger.error(f"Could not create indexes: {str(e)}")
+
+@app.on_event("startup")
+async def build_indexes():
+    """
+    Create indexes in the background: an unreachable Mongo or a first-time
+    text index build must not hold up readiness.
+    """
+    app.state.indexes = asyncio.ensure_future(ensure_indexes())
+
+@app.on_event("startup")
+async def start_scheduler():
+    if os.environ.get('SCHEDULER_ENABLED', 'true').lower() != 'false':
+        scheduler.start()
+
+@app.on_event("startup")
+async def prewarm_collectors():
+    """
+    Optionally build the nmap backend and import collectors in the background,
+    so the first scans skip that cost without delaying readiness.
+    PREWARM_COLLECTORS is a comma separated list of nmap, ssh, snmp, wmi, ad.
+    """
+    names = [n.strip() for n in os.environ.get('PREWARM_COLLECTORS', '').split(',') if n.strip()]
+    if names:
+        app.state.prewarm = asyncio.ensure_future(scanner.prewarm(names))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    indexes = getattr(app.state, 'indexes', None)
+    if indexes is not None and not indexes.done():
+        indexes.cancel()
+    await scheduler.stop()
+    scanner.winrm.close()
+    db.close()
\ No newline at end of file
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import string
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Numeric OIDs so walks do not need MIB modules loaded
+OID_SYS_NAME = '1.3.6.1.2.1.1.5'
+OID_IF_NAME = '1.3.6.1.2.1.31.1.1.1.1'
+OID_BASE_PORT_IFINDEX = '1.3.6.1.2.1.17.1.4.1.2'   # BRIDGE-MIB dot1dBasePortIfIndex
+OID_FDB_PORT = '1.3.6.1.2.1.17.4.3.1.2'            # BRIDGE-MIB dot1dTpFdbPort
+OID_QFDB_PORT = '1.3.6.1.2.1.17.7.1.2.2.1.2'       # Q-BRIDGE-MIB dot1qTpFdbPort
+OID_LLDP_LOC_PORT_ID_SUBTYPE = '1.0.8802.1.1.2.1.3.7.1.2'
+OID_LLDP_LOC_PORT_ID = '1.0.8802.1.1.2.1.3.7.1.3'
+OID_LLDP_REM_CHASSIS = '1.0.8802.1.1.2.1.4.1.1.5'
+OID_LLDP_REM_PORT_ID = '1.0.8802.1.1.2.1.4.1.1.7'
+OID_LLDP_REM_SYS_NAME = '1.0.8802.1.1.2.1.4.1.1.9'
+OID_CDP_ADDRESS = '1.3.6.1.4.1.9.9.23.1.2.1.1.4'
+OID_CDP_DEVICE_ID = '1.3.6.1.4.1.9.9.23.1.2.1.1.6'
+OID_CDP_DEVICE_PORT = '1.3.6.1.4.1.9.9.23.1.2.1.1.7'
+
+TABLES = {
+    'sys_name': OID_SYS_NAME,
+    'if_name': OID_IF_NAME,
+    'base_port': OID_BASE_PORT_IFINDEX,
+    'fdb': OID_FDB_PORT,
+    'qfdb': OID_QFDB_PORT,
+    'lldp_loc_subtype': OID_LLDP_LOC_PORT_ID_SUBTYPE,
+    'lldp_loc_port': OID_LLDP_LOC_PORT_ID,
+    'lldp_chassis': OID_LLDP_REM_CHASSIS,
+    'lldp_port': OID_LLDP_REM_PORT_ID,
+    'lldp_name': OID_LLDP_REM_SYS_NAME,
+    'cdp_address': OID_CDP_ADDRESS,
+    'cdp_device': OID_CDP_DEVICE_ID,
+    'cdp_port': OID_CDP_DEVICE_PORT,
+}
+
+# Walk result: OID suffix below the table OID -> raw value
+Rows = Dict[Tuple[int, ...], Any]
+
+
+def _octets(value) -> bytes:
+    if hasattr(value, 'asOctets'):
+        return value.asOctets()
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
+
+def _text(value) -> str:
+    """Decode an OctetString, falling back to hex for binary values"""
+    raw = _octets(value)
+    try:
+        decoded = raw.decode('utf-8')
+        if all(c in string.printable for c in decoded):
+            return decoded.strip()
+    except UnicodeDecodeError:
+        pass
+    return format_mac(raw) if len(raw) == 6 else raw.hex()
+
+
+def format_mac(octets: Iterable[int]) -> str:
+    """Format six octets the way nmap reports MAC addresses"""
+    return ':'.join(f'{b:02X}' for b in octets)
+
+
+def parse_fdb(tables: Dict[str, Rows]) -> List[Dict]:
+    """
+    Flatten BRIDGE-MIB and Q-BRIDGE-MIB forwarding tables into
+    {mac, port, vlan} entries with interface names resolved.
+    """
+    if_names = {index[0]: _text(value) for index, value in tables.get('if_name', {}).items()}
+    base_ports = {index[0]: int(value) for index, value in tables.get('base_port', {}).items()}
+
+    def port_name(bridge_port: int) -> str:
+        if_index = base_ports.get(bridge_port, bridge_port)
+        return if_names.get(if_index, str(if_index))
+
+    entries = {}
+    # Q-BRIDGE is VLAN aware; prefer it and fall back to the plain bridge table
+    for index, value in tables.get('qfdb', {}).items():
+        if len(index) == 7 and int(value):
+            mac = format_mac(index[1:])
+            entries[(mac, index[0])] = {'mac': mac, 'port': port_name(int(value)), 'vlan': index[0]}
+    if not entries:
+        for index, value in tables.get('fdb', {}).items():
+            if len(index) == 6 and int(value):
+                mac = format_mac(index)
+                entries[(mac, None)] = {'mac': mac, 'port': port_name(int(value)), 'vlan': None}
+    return list(entries.values())
+
+
+# LLDP-MIB LldpPortIdSubtype values
+LLDP_PORT_ID_INTERFACE_NAME = 5
+LLDP_PORT_ID_LOCAL = 7
+
+
+def _lldp_local_ports(tables: Dict[str, Rows], if_names: Dict[int, str]) -> Dict[int, str]:
+    """
+    Map lldpLocPortNum to the ifName the forwarding table reports for that port.
+
+    Prefer lldpLocPortId when it carries the interface name (or a local ifIndex);
+    otherwise lldpLocPortNum is a bridge port number (or already an ifIndex).
+    """
+    base_ports = {index[0]: int(value) for index, value in tables.get('base_port', {}).items()}
+    subtypes = {index[0]: int(value) for index, value in tables.get('lldp_loc_subtype', {}).items()}
+    port_ids = {index[0]: _text(value) for index, value in tables.get('lldp_loc_port', {}).items()}
+    known_names = set(if_names.values())
+
+    def resolve(port_num: int) -> str:
+        port_id = port_ids.get(port_num)
+        subtype = subtypes.get(port_num)
+        if port_id and (subtype == LLDP_PORT_ID_INTERFACE_NAME or port_id in known_names):
+            return port_id
+        if port_id and subtype == LLDP_PORT_ID_LOCAL and port_id.isdigit() and int(port_id) in if_names:
+            return if_names[int(port_id)]
+        if_index = base_ports.get(port_num, port_num)
+        return if_names.get(if_index, str(if_index))
+
+    port_nums = set(subtypes) | set(port_ids)
+    port_nums.update(index[1] for index in tables.get('lldp_chassis', {}) if len(index) >= 3)
+    return {port_num: resolve(port_num) for port_num in port_nums}
+
+
+def parse_neighbours(tables: Dict[str, Rows]) -> List[Dict]:
+    """
+    Combine LLDP and CDP caches into a list of neighbour links.
+    Local ports are reported as ifName, the same names parse_fdb uses.
+    """
+    if_names = {index[0]: _text(value) for index, value in tables.get('if_name', {}).items()}
+    lldp_ports = _lldp_local_ports(tables, if_names)
+    neighbours = []
+
+    # lldpRemTable index: timeMark.localPortNum.remIndex
+    for index, chassis in tables.get('lldp_chassis', {}).items():
+        if len(index) < 3:
+            continue
+        local_port = index[1]
+        neighbours.append({
+            'protocol': 'lldp',
+            'local_port': lldp_ports[local_port],
+            'remote_id': _text(chassis),
+            'remote_name': _text(tables.get('lldp_name', {}).get(index, b'')) or None,
+            'remote_port': _text(tables.get('lldp_port', {}).get(index, b'')) or None,
+            'remote_address': None,
+        })
+
+    # cdpCacheTable index: ifIndex.deviceIndex
+    for index, device_id in tables.get('cdp_device', {}).items():
+        if len(index) < 2:
+            continue
+        address = _octets(tables.get('cdp_address', {}).get(index, b''))
+        neighbours.append({
+            'protocol': 'cdp',
+            'local_port': if_names.get(index[0], str(index[0])),
+            'remote_id': _text(device_id),
+            'remote_name': _text(device_id),
+            'remote_port': _text(tables.get('cdp_port', {}).get(index, b'')) or None,
+            'remote_address': '.'.join(str(b) for b in address) if len(address) == 4 else None,
+        })
+    return neighbours
+
+
+def locate_devices(switches: List[Dict], devices_by_mac: Dict[str, List[str]]) -> Dict[str, Dict]:
+    """
+    Set-based join of every switch's forwarding table against known devices.
+
+    A MAC is learned on every switch between it and the observer, so each device
+    is attached to the port that sees the fewest MACs, ignoring ports that have
+    an LLDP/CDP neighbour (inter-switch links).
+
+    Returns device id -> {attached_switch, switch_port, vlan}
+    """
+    best: Dict[str, Tuple[int, Dict]] = {}
+    for switch in switches:
+        uplinks = {n['local_port'] for n in switch['neighbours']}
+        port_load: Dict[str, int] = defaultdict(int)
+        for entry in switch['fdb']:
+            port_load[entry['port']] += 1
+
+        for entry in switch['fdb']:
+            if entry['port'] in uplinks or entry['mac'] not in devices_by_mac:
+                continue
+            load = port_load[entry['port']]
+            current = best.get(entry['mac'])
+            if current is None or load < current[0]:
+                best[entry['mac']] = (load, {
+                    'attached_switch': switch['ip_address'],
+                    'switch_port': entry['port'],
+                    'vlan': entry['vlan'],
+                })
+
+    attachments = {}
+    for mac, (_, location) in best.items():
+        for device_id in devices_by_mac[mac]:
+            attachments[device_id] = location
+    return attachments
+
+
+class TopologyCollector:
+    """Walks LLDP, CDP and bridge forwarding tables on switches over SNMP"""
+
+    def __init__(self, max_concurrent: int = 8, timeout: float = 5.0, retries: int = 1, max_repetitions: int = 50):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+
+    async def _walk(self, engine, auth, target, oid: str) -> Rows:
+        from pysnmp.hlapi.v3arch.asyncio import bulk_walk_cmd, ContextData, ObjectType, ObjectIdentity
+
+        prefix = len(oid.split('.'))
+        rows: Rows = {}
+        async for error_indication, error_status, _, var_binds in bulk_walk_cmd(
+            engine, auth, target, ContextData(), 0, self.max_repetitions,
+            ObjectType(ObjectIdentity(oid)),
+            lexicographicMode=False,
+            lookupMib=False
+        ):
+            if error_indication or error_status:
+                logger.debug(f"SNMP walk of {oid} stopped: {error_indication or error_status.prettyPrint()}")
+                break
+            for name, value in var_binds:
+                rows[tuple(name)[prefix:]] = value
+        return rows
+
+    async def collect_switch(self, ip_address: str, community: str) -> Dict:
+        """Walk all topology tables on one switch concurrently"""
+        from pysnmp.hlapi.v3arch.asyncio import SnmpEngine, CommunityData, UdpTransportTarget
+
+        engine = SnmpEngine()
+        try:
+            auth = CommunityData(community)
+            target = await UdpTransportTarget.create((ip_address, 161), timeout=self.timeout, retries=self.retries)
+
+            names = list(TABLES)
+            results = await asyncio.gather(
+                *(self._walk(engine, auth, target, TABLES[name]) for name in names),
+                return_exceptions=True
+            )
+        finally:
+            # Each engine opens its own UDP socket
+            engine.close_dispatcher()
+        tables = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.debug(f"SNMP walk {name} failed on {ip_address}: {str(result)}")
+                result = {}
+            tables[name] = result
+
+        sys_name = next(iter(tables['sys_name'].values()), None)
+        return {
+            'ip_address': ip_address,
+            'sys_name': _text(sys_name) if sys_name is not None else None,
+            'neighbours': parse_neighbours(tables),
+            'fdb': parse_fdb(tables),
+        }
+
+    async def collect(self, switches: List[str], community: str) -> List[Dict]:
+        """Collect from many switches with bounded concurrency; unreachable switches are dropped"""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def bounded(ip_address: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self.collect_switch(ip_address, community)
+                except Exception as e:
+                    logger.error(f"Topology collection failed for {ip_address}: {str(e)}")
+                    return None
+
+        results = await asyncio.gather(*(bounded(ip) for ip in switches))
+        return [r for r in results if r is not None]
+
+
+async def store_topology(db, switches: List[Dict]) -> Dict[str, int]:
+    """
+    Persist switch neighbour tables and attach devices to switch ports.
+    Devices are looked up in one $in query and updated with one bulk_write.
+    """
+    collected_at = datetime.now(timezone.utc).isoformat()
+
+    macs = {entry['mac'] for switch in switches for entry in switch['fdb']}
+    devices_by_mac: Dict[str, List[str]] = defaultdict(list)
+    if macs:
+        lookup = list(macs) + [mac.lower() for mac in macs]
+        cursor = db.devices.find({'mac_address': {'$in': lookup}}, {'_id': 0, 'id': 1, 'mac_address': 1})
+        async for device in cursor:
+            devices_by_mac[device['mac_address'].upper()].append(device['id'])
+
+    attachments = locate_devices(switches, devices_by_mac)
+    if attachments:
+        await db.devices.bulk_write([
+            UpdateOne({'id': device_id}, {'$set': {**location, 'topology_updated_at': collected_at}})
+            for device_id, location in attachments.items()
+        ], ordered=False)
+
+    if switches:
+        await db.topology.bulk_write([
+            UpdateOne(
+                {'ip_address': switch['ip_address']},
+                {'$set': {
+                    'ip_address': switch['ip_address'],
+                    'sys_name': switch['sys_name'],
+                    'neighbours': switch['neighbours'],
+                    'fdb_entries': len(switch['fdb']),
+                    'collected_at': collected_at,
+                }},
+                upsert=True
+            )
+            for switch in switches
+        ], ordered=False)
+
+    return {'switches': len(switches), 'fdb_entries': sum(len(s['fdb']) for s in switches),
+            'devices_attached': len(attachments)}
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from base64 import b64encode
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Longest single WS-Man Receive; output is polled in steps of this so the
+# overall deadline is checked regularly
+RECEIVE_TIMEOUT = 20
+
+# One round trip per host: everything the inventory needs, returned as JSON.
+# Installed software is counted from the uninstall registry keys because
+# Win32_Product is slow and triggers MSI consistency checks.
+INVENTORY_SCRIPT = r"""
+$ErrorActionPreference = 'SilentlyContinue'
+$os = Get-CimInstance Win32_OperatingSystem
+$cs = Get-CimInstance Win32_ComputerSystem
+$cpu = @(Get-CimInstance Win32_Processor)
+$disks = @(Get-CimInstance Win32_LogicalDisk -Filter 'DriveType=3')
+$software = @(Get-ItemProperty 'HKLM:\Software\Microsoft\Windows\CurrentVersion\Uninstall\*',
+                               'HKLM:\Software\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall\*' |
+              Where-Object { $_.DisplayName }).Count
+[pscustomobject]@{
+    hostname = $cs.Name
+    domain = $cs.Domain
+    manufacturer = $cs.Manufacturer
+    model = $cs.Model
+    os_name = $os.Caption
+    os_version = $os.Version
+    os_build = $os.BuildNumber
+    memory_bytes = $cs.TotalPhysicalMemory
+    cpu = @($cpu | ForEach-Object { [pscustomobject]@{ name = $_.Name; cores = $_.NumberOfCores; threads = $_.NumberOfLogicalProcessors } })
+    disks = @($disks | ForEach-Object { [pscustomobject]@{ drive = $_.DeviceID; size = $_.Size; free = $_.FreeSpace } })
+    installed_software_count = $software
+} | ConvertTo-Json -Depth 4 -Compress
+"""
+
+
+def _gib(value) -> str:
+    return f"{(value or 0) / 1024 ** 3:.1f} GiB"
+
+
+def format_inventory(data: Dict) -> Dict:
+    """
+    Map the PowerShell inventory onto hardware_specs.
+    cpu/memory/disk/os_release are text, matching what the SSH collector stores.
+    """
+    cpus = data.get('cpu') or []
+    if isinstance(cpus, dict):
+        cpus = [cpus]
+    disks = data.get('disks') or []
+    if isinstance(disks, dict):
+        disks = [disks]
+
+    return {
+        'scan_type': 'WinRM',
+        'cpu': '\n'.join(
+            f"{c.get('name', 'Unknown')} ({c.get('cores')} cores, {c.get('threads')} threads)" for c in cpus
+        ),
+        'memory': _gib(data.get('memory_bytes')),
+        'disk': '\n'.join(
+            f"{d.get('drive')} {_gib(d.get('free'))} free of {_gib(d.get('size'))}" for d in disks
+        ),
+        'os_release': f"{data.get('os_name', '')} {data.get('os_version', '')}".strip(),
+        'os_build': data.get('os_build'),
+        'manufacturer': data.get('manufacturer'),
+        'model': data.get('model'),
+        'hostname': data.get('hostname'),
+        'domain': data.get('domain'),
+        'installed_software_count': data.get('installed_software_count'),
+    }
+
+
+class WinRMCollector:
+    """
+    Windows inventory over WinRM.
+
+    Protocol objects (and their authenticated HTTP connections) are kept per
+    host and credential so rescans skip the NTLM/Kerberos handshake. pywinrm is
+    synchronous, so calls run on a dedicated pool of max_concurrent threads.
+    A worker only frees its slot once the session is no longer in use; a
+    script still running after `timeout` seconds is terminated, so a host with
+    a hung WMI query cannot hold a worker forever.
+    """
+
+    def __init__(
+        self,
+        transport: str = 'ntlm',
+        use_https: bool = False,
+        port: Optional[int] = None,
+        max_concurrent: int = 16,
+        timeout: float = 60.0,
+        max_sessions: int = 256,
+        server_cert_validation: str = 'validate',
+    ):
+        self.transport = transport
+        self.scheme = 'https' if use_https else 'http'
+        self.port = port or (5986 if use_https else 5985)
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        if server_cert_validation not in ('validate', 'ignore'):
+            raise ValueError(f"server_cert_validation must be 'validate' or 'ignore', not {server_cert_validation!r}")
+        self.server_cert_validation = server_cert_validation
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sessions: "OrderedDict[Tuple[str, str, str], Tuple[object, threading.Lock]]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+
+    def endpoint(self, ip_address: str) -> str:
+        host = f'[{ip_address}]' if ':' in ip_address else ip_address
+        return f'{self.scheme}://{host}:{self.port}/wsman'
+
+    @property
+    def _receive_timeout(self) -> int:
+        return max(1, min(int(self.timeout), RECEIVE_TIMEOUT))
+
+    def _command_output(self, protocol, shell_id: str, command_id: str) -> Tuple[bytes, bytes, int]:
+        """
+        Collect a command's output like Protocol.get_command_output, but give up
+        after `timeout` seconds instead of retrying Receive timeouts forever
+        """
+        from winrm.exceptions import WinRMOperationTimeoutError
+
+        deadline = time.monotonic() + self.timeout
+        stdout, stderr = [], []
+        while True:
+            try:
+                out, err, status, done = protocol.get_command_output_raw(shell_id, command_id)
+            except WinRMOperationTimeoutError:
+                # No output yet; the command is still running
+                out, err, status, done = b'', b'', -1, False
+            stdout.append(out)
+            stderr.append(err)
+            if done:
+                return b''.join(stdout), b''.join(stderr), status
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Command did not finish within {self.timeout:g}s")
+
+    @staticmethod
+    def _key(ip_address: str, username: str, password: str) -> Tuple[str, str, str]:
+        return (ip_address, username, hashlib.sha256(password.encode('utf-8')).hexdigest())
+
+    def _session(self, ip_address: str, username: str, password: str):
+        """Return a cached (protocol, lock) pair for this host and credential"""
+        from winrm.protocol import Protocol
+
+        key = self._key(ip_address, username, password)
+        evicted = []
+        with self._sessions_lock:
+            if key in self._sessions:
+                self._sessions.move_to_end(key)
+                return self._sessions[key]
+
+            protocol = Protocol(
+                self.endpoint(ip_address),
+                transport=self.transport,
+                username=username,
+                password=password,
+                server_cert_validation=self.server_cert_validation,
+                operation_timeout_sec=self._receive_timeout,
+                read_timeout_sec=self._receive_timeout + 10,
+            )
+            entry = self._sessions[key] = (protocol, threading.Lock())
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+
+        for old, old_lock in evicted:
+            # Wait for a command still running on the evicted session before closing it
+            with old_lock:
+                old.transport.close_session()
+        return entry
+
+    def _run_ps(self, ip_address: str, username: str, password: str, script: str) -> Tuple[bytes, bytes, int]:
+        key = self._key(ip_address, username, password)
+        entry = self._session(ip_address, username, password)
+        protocol, lock = entry
+        encoded = b64encode(script.encode('utf_16_le')).decode('ascii')
+        with lock:
+            try:
+                shell_id = protocol.open_shell()
+                try:
+                    command_id = protocol.run_command(
+                        shell_id, f'powershell -NoProfile -NonInteractive -EncodedCommand {encoded}'
+                    )
+                    try:
+                        return self._command_output(protocol, shell_id, command_id)
+                    finally:
+                        # Signals terminate, which also stops a command that timed out
+                        protocol.cleanup_command(shell_id, command_id)
+                finally:
+                    # Keep the HTTP session open for the next scan of this host
+                    protocol.close_shell(shell_id, close_session=False)
+            except Exception:
+                # A broken or timed-out session must not be reused. Evict it while
+                # still holding its lock, so no other call is using it when it closes.
+                with self._sessions_lock:
+                    if self._sessions.get(key) is entry:
+                        del self._sessions[key]
+                protocol.transport.close_session()
+                raise
+
+    async def collect(self, ip_address: str, username: str, password: str) -> Dict:
+        """Run the inventory script on one host and return hardware_specs"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='winrm')
+
+        stdout, stderr, status = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._run_ps, ip_address, username, password, INVENTORY_SCRIPT
+        )
+
+        if status != 0 or not stdout.strip():
+            raise RuntimeError(f"Inventory script failed ({status}): {stderr.decode('utf-8', errors='ignore')[:500]}")
+
+        return format_inventory(json.loads(stdout.decode('utf-8', errors='ignore')))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for protocol, _ in sessions:
+            protocol.transport.close_session()
@@ -0,0 +1,33 @@
+import argparse
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules are imported top-level, as server.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+
+@pytest.fixture
+def database():
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()['test']
+
+
+@pytest.fixture
+def server(database):
+    """server.py on the fake nmap backend, bound to a fresh in-memory database"""
+    from benchmarks.__main__ import load_server
+
+    server = load_server(argparse.Namespace(up_ratio=1.0, seed=1, mongo_url=None, db_name='test', verbose=False))
+    server.db.bind(database)
+    server.stats_cache.invalidate()
+    return server
+
+
+@pytest.fixture
+def client(server):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test')
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pysnmp.hlapi.v3arch.asyncio as snmp
+
+from benchmarks.fake_nmap import FakePortScanner
+from network_scanner import NetworkScanner
+
+DEVICE = {'id': 'd1', 'ip_address': '127.0.0.1', 'hostname': 'host', 'device_type': 'Unknown'}
+
+
+def test_snmp_failure_falls_through_to_the_next_candidate(monkeypatch):
+    async def get_cmd(*args, **kwargs):
+        return 'No SNMP response received before timeout', 0, 0, []
+
+    async def ssh_scan(ip_address, username, password):
+        return {'hardware_specs': {'cpu': 'x86_64'}}
+
+    monkeypatch.setattr(snmp, 'get_cmd', get_cmd)
+    scanner = NetworkScanner(port_scanner=FakePortScanner(up_ratio=1.0))
+    monkeypatch.setattr(scanner, '_ssh_scan', ssh_scan)
+    candidates = [
+        {'profile_id': 'snmp', 'auth_type': 'snmp', 'username': '', 'password': 'wrong', 'community': 'wrong'},
+        {'profile_id': 'ssh', 'auth_type': 'ssh', 'username': 'root', 'password': 'pw'},
+    ]
+
+    info, succeeded, failed = asyncio.run(scanner.detailed_scan_with_candidates(DEVICE, candidates))
+    assert (succeeded, failed) == ('ssh', ['snmp'])
+    assert info['authenticated'] is True
+    assert info['hardware_specs'] == {'cpu': 'x86_64'}
+
+
+def test_ssh_collection_runs_off_the_event_loop(monkeypatch):
+    def blocking_collect(ip_address, username, password):
+        time.sleep(0.2)
+        return {'cpu': ip_address}
+
+    monkeypatch.setattr(NetworkScanner, '_ssh_collect', staticmethod(blocking_collect))
+    scanner = NetworkScanner(port_scanner=FakePortScanner(up_ratio=1.0))
+
+    async def run():
+        return await asyncio.gather(*(scanner._ssh_scan(f'10.0.0.{i}', 'root', 'pw') for i in range(3)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    assert time.perf_counter() - start < 0.5
+    assert [r['hardware_specs']['cpu'] for r in results] == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
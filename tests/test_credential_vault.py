@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+from cryptography.fernet import Fernet
+
+from credential_vault import CredentialVault
+
+
+def make_vault(database, **kwargs):
+    return CredentialVault(database.credential_profiles, database.credential_hints,
+                           key=Fernet.generate_key().decode(), **kwargs)
+
+
+def test_profiles_added_elsewhere_are_seen_after_the_ttl(database):
+    vault = make_vault(database, profile_ttl=0)
+    other_replica = make_vault(database)
+
+    async def run():
+        assert await vault.list_profiles() == []
+        await other_replica.create_profile('admin', 'ssh', 'root', 'pw', ['10.0.0.0/24'], [])
+        return await vault.list_profiles()
+
+    assert [p['name'] for p in asyncio.run(run())] == ['admin']
+
+
+@pytest.fixture
+def server(server, monkeypatch):
+    monkeypatch.setattr(server, 'vault', make_vault(server.db))
+    return server
+
+
+def test_unknown_profile_id_is_rejected(server):
+    async def run():
+        await server.db.devices.insert_one({'id': 'd1', 'ip_address': '10.0.0.1'})
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+            single = await client.post('/api/scan/detailed', json={'device_id': 'd1', 'credential_profile_id': 'nope'})
+            bulk = await client.post('/api/scan/detailed/bulk', json={'device_ids': ['d1'], 'credential_profile_id': 'nope'})
+            return single.status_code, bulk.status_code
+
+    assert asyncio.run(run()) == (404, 404)
+
+
+def test_records_sharing_an_ip_are_scanned_once(server, monkeypatch):
+    scanned = []
+
+    async def scan(device, candidates, refresh=False):
+        scanned.append(device['id'])
+        # Like the real scanner: the scanned record's own fields plus the scan output
+        return {**device, 'os_info': {'name': 'Linux'}, 'authenticated': True, 'scan_error': None}, 'p1', []
+
+    monkeypatch.setattr(server.scanner, 'detailed_scan_with_candidates', scan)
+    devices = [
+        {'id': 'old', 'ip_address': '10.0.0.1', 'discovered_at': '2026-01-01'},
+        {'id': 'new', 'ip_address': '10.0.0.1', 'discovered_at': '2026-02-01'},
+        {'id': 'other', 'ip_address': '10.0.0.2', 'discovered_at': '2026-01-01'},
+    ]
+
+    async def run():
+        await server.ensure_indexes()
+        await server.db.devices.insert_many([dict(d) for d in devices])
+        await server.perform_vault_scan(devices)
+        return await server.db.devices.find({}, {'_id': 0}).sort('id', 1).to_list(None)
+
+    stored = asyncio.run(run())
+    assert sorted(scanned) == ['new', 'other']
+    assert [(d['id'], d['discovered_at']) for d in stored] == [
+        ('new', '2026-02-01'), ('old', '2026-01-01'), ('other', '2026-01-01')
+    ]
+    assert all(d['authenticated'] and d['os_info'] == {'name': 'Linux'} and not d['scan_error'] for d in stored)
+
+
+def test_vault_sweep_scans_hosts_concurrently(server, monkeypatch):
+    running, peak = 0, 0
+
+    async def scan(device, candidates, refresh=False):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {'scan_error': None}, None, []
+
+    monkeypatch.setattr(server.scanner, 'detailed_scan_with_candidates', scan)
+    monkeypatch.setattr(server, 'DETAILED_SCAN_CONCURRENCY', 4)
+    devices = [{'id': f'd{i}', 'ip_address': f'10.0.0.{i}'} for i in range(1, 11)]
+
+    asyncio.run(server.perform_vault_scan(devices))
+    assert peak == 4
+
+
+def test_bulk_range_scans_latest_record_per_ip(server, monkeypatch):
+    started = []
+    monkeypatch.setattr(server, 'perform_vault_scan', lambda devices, *args: started.append(devices))
+
+    async def run():
+        await server.db.devices.insert_many([
+            {'id': 'old', 'ip_address': '10.0.0.1', 'discovered_at': '2026-01-01'},
+            {'id': 'new', 'ip_address': '10.0.0.1', 'discovered_at': '2026-02-01'},
+            {'id': 'outside', 'ip_address': '10.0.1.1', 'discovered_at': '2026-02-01'},
+        ])
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+            return await client.post('/api/scan/detailed/bulk', json={'network_range': '10.0.0.0/24'})
+
+    response = asyncio.run(run())
+    assert response.json()['devices'] == 1
+    assert [d['id'] for d in started[0]] == ['new']
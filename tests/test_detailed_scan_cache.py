@@ -0,0 +1,76 @@
+import asyncio
+
+from benchmarks.fake_nmap import FakePortScanner
+from network_scanner import NetworkScanner
+
+
+class CountingScanner(FakePortScanner):
+    def __init__(self, fail=False):
+        super().__init__(up_ratio=1.0)
+        self.fail = fail
+        # Shared with the per-scan copies NetworkScanner makes
+        self.calls = []
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        self.calls.append(hosts)
+        if self.fail:
+            raise RuntimeError('nmap exited 1')
+        return super().scan(hosts=hosts, ports=ports, arguments=arguments, sudo=sudo, timeout=timeout)
+
+
+def record(device_id, **fields):
+    return {'id': device_id, 'ip_address': '10.0.0.7', 'hostname': 'host', 'os_info': None,
+            'open_ports': [], 'device_type': 'Unknown', **fields}
+
+
+def test_cached_result_fills_other_records_for_the_same_address():
+    port_scanner = CountingScanner()
+    scanner = NetworkScanner(port_scanner=port_scanner)
+
+    async def run():
+        first = await scanner.detailed_scan(record('a'))
+        # A rediscovered record already holding the scan output must not mask it
+        await scanner.detailed_scan(record('b', os_info=first['os_info'], open_ports=first['open_ports']))
+        return first, await scanner.detailed_scan(record('c'))
+
+    first, third = asyncio.run(run())
+    assert len(port_scanner.calls) == 1
+    assert third['id'] == 'c'
+    assert third['os_info'] == first['os_info'] and third['os_info'] is not None
+    assert third['open_ports'] == first['open_ports'] and third['open_ports']
+    assert third['scan_error'] is None
+
+
+def test_failures_are_not_cached_even_if_the_record_holds_the_same_error():
+    port_scanner = CountingScanner(fail=True)
+    scanner = NetworkScanner(port_scanner=port_scanner)
+
+    async def run():
+        return [await scanner.detailed_scan(record('a', scan_error='nmap exited 1')) for _ in range(2)]
+
+    results = asyncio.run(run())
+    assert len(port_scanner.calls) == 2
+    assert all(r['scan_error'] == 'nmap exited 1' for r in results)
+
+
+def test_failed_authentication_is_retried_not_cached():
+    port_scanner = CountingScanner()
+    scanner = NetworkScanner(port_scanner=port_scanner)
+    attempts = []
+
+    async def authenticated_scan(ip_address, credentials):
+        attempts.append(ip_address)
+        return {'hardware_specs': {'cpu': 'x86_64'}} if len(attempts) > 1 else None
+
+    scanner._authenticated_scan = authenticated_scan
+    credentials = {'auth_type': 'ssh', 'username': 'root', 'password': 'pw'}
+
+    async def run():
+        return [await scanner.detailed_scan(record('a'), credentials) for _ in range(3)]
+
+    first, second, third = asyncio.run(run())
+    assert not first.get('authenticated')
+    assert second['authenticated'] and third['authenticated']
+    # The failed attempt was retried; the successful one was served from the cache
+    assert len(attempts) == 2
+    assert len(port_scanner.calls) == 2
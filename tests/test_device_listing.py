@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+DEVICE = {
+    'id': 'd1', 'scan_id': 's1', 'ip_address': '10.0.0.1', 'mac_address': 'AA:BB:CC:DD:EE:01',
+    'hostname': 'web-1', 'device_type': 'Server', 'status': 'up', 'authenticated': True,
+    'discovered_at': '2026-01-01T00:00:00+00:00', 'open_ports': [{'port': 22, 'service': 'ssh'}],
+    'os_info': {'name': 'Linux', 'os_family': 'Linux'}, 'hardware_specs': {'cpu': 'x' * 1000},
+}
+
+
+class RecordingDatabase:
+    """Wraps a database and records the projection of every devices.find"""
+
+    def __init__(self, database):
+        self.database = database
+        self.projections = []
+
+    def __getitem__(self, name):
+        collection = self.database[name]
+        if name != 'devices':
+            return collection
+        recorder = self
+
+        class Devices:
+            def find(self, query=None, projection=None, *args, **kwargs):
+                recorder.projections.append(projection)
+                return collection.find(query, projection, *args, **kwargs)
+
+            def __getattr__(self, attr):
+                return getattr(collection, attr)
+
+        return Devices()
+
+
+@pytest.fixture
+def recording(server, database):
+    recording = RecordingDatabase(database)
+    server.db.bind(recording)
+    asyncio.run(database.devices.insert_one(dict(DEVICE)))
+    return recording
+
+
+def get(client, **params):
+    async def run():
+        async with client:
+            return await client.get('/api/devices', params=params)
+
+    return asyncio.run(run())
+
+
+def test_summary_projection_is_pushed_into_find(server, client, recording):
+    response = get(client, view='summary')
+    assert response.status_code == 200
+    # Summary fields the record has (it was never scanned, so no last_scanned)
+    assert set(response.json()[0]) == set(server.SUMMARY_FIELDS) - {'last_scanned'}
+    projection = recording.projections[-1]
+    assert projection['_id'] == 0
+    assert {field for field, include in projection.items() if include} == set(server.SUMMARY_FIELDS)
+
+
+def test_fields_take_precedence_over_view(client, recording):
+    response = get(client, view='summary', fields='hostname, os_info')
+    assert response.json() == [{'id': 'd1', 'hostname': 'web-1', 'os_info': DEVICE['os_info']}]
+    assert recording.projections[-1] == {'hostname': 1, 'os_info': 1, 'id': 1, '_id': 0}
+
+
+def test_full_view_returns_validated_devices(client, recording):
+    device = get(client).json()[0]
+    assert device['hardware_specs'] == DEVICE['hardware_specs']
+    assert device['open_ports'] == DEVICE['open_ports']
+    assert recording.projections[-1] == {'_id': 0}
+
+
+@pytest.mark.parametrize('params', [{'fields': 'hostname,password'}, {'view': 'compact'}])
+def test_unknown_fields_and_views_are_rejected(client, recording, params):
+    response = get(client, **params)
+    assert response.status_code == 400
+    assert recording.projections == []
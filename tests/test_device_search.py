@@ -0,0 +1,66 @@
+import asyncio
+
+DEVICES = [
+    {'id': f'd{n}', 'ip_address': ip, 'hostname': f'host-{n}', 'device_type': kind, 'status': 'up',
+     'scan_id': 's1', 'mac_address': None, 'open_ports': [], 'os_info': None, 'authenticated': False,
+     'discovered_at': '2026-01-01T00:00:00+00:00'}
+    for n, (ip, kind) in enumerate([
+        ('10.0.0.1', 'Server'), ('10.0.0.1', 'Server'), ('10.0.0.2', 'Router'),
+        ('10.0.0.3', 'Server'), ('10.0.0.4', 'Server'), ('10.0.0.5', 'Printer'),
+    ])
+]
+
+
+def test_build_search_query(server):
+    query = server.build_search_query(q='ssh nginx', hostname='web.1', mac='aa-bb-cc-dd-ee-ff', ports=[22, 443],
+                               service='http', os_family='Linux', device_type='Server', scan_id='s1')
+    assert query == {
+        '$text': {'$search': 'ssh nginx'},
+        'hostname': {'$regex': r'^web\.1'},
+        'mac_address': {'$in': ['AA:BB:CC:DD:EE:FF', 'aa:bb:cc:dd:ee:ff']},
+        'open_ports.port': {'$all': [22, 443]},
+        'open_ports.service': 'http',
+        'os_info.os_family': 'Linux',
+        'device_type': 'Server',
+        'scan_id': 's1',
+    }
+    assert server.build_search_query() == {}
+
+
+def test_cursor_resumes_after_the_last_ip_and_id(server):
+    assert server.build_search_query(cursor='10.0.0.1|d1') == {'$or': [
+        {'ip_address': {'$gt': '10.0.0.1'}},
+        {'ip_address': '10.0.0.1', 'id': {'$gt': 'd1'}},
+    ]}
+
+
+def test_keyset_pages_cover_every_match_once(server, client):
+    async def run():
+        await server.db.devices.insert_many([dict(d) for d in DEVICES])
+        pages, cursor = [], None
+        async with client:
+            while True:
+                params = {'device_type': 'Server', 'limit': 2, 'fields': 'hostname'}
+                if cursor:
+                    params['cursor'] = cursor
+                body = (await client.get('/api/devices/search', params=params)).json()
+                pages.append(body['devices'])
+                cursor = body['next_cursor']
+                if not cursor:
+                    return pages
+
+    pages = asyncio.run(run())
+    # Records sharing an IP are split across pages by id without skipping either
+    assert [[d['id'] for d in page] for page in pages] == [['d0', 'd1'], ['d3', 'd4'], []]
+    # Cursor fields the caller did not ask for are not returned
+    assert all(set(d) == {'id', 'hostname'} for page in pages for d in page)
+
+
+def test_search_filters_have_indexes_in_search_order(server):
+    async def run():
+        await server.ensure_indexes()
+        return await server.db.devices.index_information()
+
+    keys = [list(info['key']) for info in asyncio.run(run()).values()]
+    for field in server.SEARCH_SORTED_FILTERS:
+        assert [(field, 1), ('ip_address', 1), ('id', 1)] in keys
@@ -0,0 +1,62 @@
+import asyncio
+
+from device_stats import collect_stats
+
+DEVICES = [
+    {'id': 'a', 'scan_id': 's1', 'ip_address': '10.0.0.1', 'device_type': 'Server', 'status': 'up',
+     'os_info': {'os_family': 'Linux', 'vendor': 'Linux'},
+     'open_ports': [{'port': 22, 'service': 'ssh'}, {'port': 80, 'service': 'http'}]},
+    {'id': 'b', 'scan_id': 's1', 'ip_address': '10.0.1.7', 'device_type': 'Router', 'status': 'up',
+     'os_info': None, 'open_ports': [{'port': 22, 'service': 'ssh'}]},
+    {'id': 'c', 'scan_id': 's2', 'ip_address': '2001:db8::1', 'status': 'down', 'open_ports': []},
+]
+
+
+def stats(database, *args):
+    async def run():
+        await database.devices.insert_many([dict(d) for d in DEVICES])
+        return await collect_stats(database.devices, *args)
+
+    return asyncio.run(run())
+
+
+def test_all_facets(database):
+    assert stats(database) == {
+        'scan_id': None,
+        'total_devices': 3,
+        'device_type': {'Router': 1, 'Server': 1, 'Unknown': 1},
+        'status': {'up': 2, 'down': 1},
+        'os_family': {'Unknown': 2, 'Linux': 1},
+        'vendor': {'Unknown': 2, 'Linux': 1},
+        'services': {'ssh': 2, 'http': 1},
+        'subnets': {'10.0.0.0/24': 1, '10.0.1.0/24': 1, 'other': 1},
+    }
+
+
+def test_single_facet_for_one_scan(database):
+    assert stats(database, 's2', ['status']) == {'scan_id': 's2', 'total_devices': 1, 'status': {'down': 1}}
+
+
+def test_empty_collection(database):
+    assert asyncio.run(collect_stats(database.devices, None, ['device_type'])) == {
+        'scan_id': None, 'total_devices': 0, 'device_type': {},
+    }
+
+
+def test_stats_endpoint_is_cached_until_devices_change(server, client):
+    async def run():
+        await server.db.devices.insert_many([dict(d) for d in DEVICES])
+        async with client:
+            first = (await client.get('/api/stats/device_type')).json()
+            await server.db.devices.delete_one({'id': 'c'})
+            cached = (await client.get('/api/stats/device_type')).json()
+            await client.delete('/api/devices/b')
+            fresh = (await client.get('/api/stats/device_type')).json()
+            missing = await client.get('/api/stats/nope')
+        return first, cached, fresh, missing.status_code
+
+    first, cached, fresh, missing = asyncio.run(run())
+    assert first['total_devices'] == cached['total_devices'] == 3
+    # Deleting through the API invalidates the cache
+    assert fresh == {'scan_id': None, 'total_devices': 1, 'device_type': {'Server': 1}}
+    assert missing == 404
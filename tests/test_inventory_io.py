@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from mongomock_motor import AsyncMongoMockClient
+
+from inventory_io import EXPORTERS, IMPORTERS, BulkUpserter, import_ndjson
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_ndjson_import_reports_non_object_records_and_keeps_going():
+    collection = AsyncMongoMockClient()['test'].devices
+    body = (
+        b'{"ip_address": "10.0.0.1"}\n'
+        b'[1]\n'
+        b'"10.0.0.2"\n'
+        b'{"ip_address": "10.0.0.3"}\n'
+    )
+
+    async def run():
+        upserter = BulkUpserter(collection, batch_size=1)
+        await import_ndjson(chunks(body), upserter)
+        return upserter.summary(), await collection.count_documents({})
+
+    summary, stored = asyncio.run(run())
+    assert stored == 2
+    assert summary['upserted'] == 2
+    assert len(summary['errors']) == 2
+    assert summary['errors'][0].startswith('record 2:')
+    assert 'expected an object' in summary['errors'][0]
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv', 'parquet'])
+def test_topology_fields_round_trip(fmt):
+    device = {
+        'id': 'd1', 'ip_address': '10.0.0.1', 'mac_address': 'AA:BB:CC:DD:EE:01',
+        'attached_switch': '10.0.0.254', 'switch_port': 'Gi1/0/7', 'vlan': 20,
+        'topology_updated_at': '2026-01-01T00:00:00+00:00',
+    }
+    collection = AsyncMongoMockClient()['test'].devices
+
+    async def run():
+        exported = await collect(EXPORTERS[fmt](chunks([device])))
+        upserter = BulkUpserter(collection)
+        await IMPORTERS[fmt](chunks(*exported), upserter)
+        await upserter.flush()
+        return upserter.summary(), await collection.find_one({'id': 'd1'}, {'_id': 0})
+
+    summary, stored = asyncio.run(run())
+    assert summary['errors'] == []
+    assert stored['attached_switch'] == '10.0.0.254'
+    assert stored['switch_port'] == 'Gi1/0/7'
+    assert stored['vlan'] == 20
+    assert stored['topology_updated_at'] == '2026-01-01T00:00:00+00:00'
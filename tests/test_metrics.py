@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram, render_metrics
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry(monkeypatch):
+    monkeypatch.setattr(metrics, '_registry', [])
+
+
+def test_counter_with_labels():
+    counter = Counter('test_failures_total', 'Failures', ['protocol'])
+    counter.inc('ssh')
+    counter.inc('ssh', amount=2)
+    counter.inc('wmi "x"\n')
+    assert render_metrics() == (
+        '# HELP test_failures_total Failures\n'
+        '# TYPE test_failures_total counter\n'
+        'test_failures_total{protocol="ssh"} 3\n'
+        'test_failures_total{protocol="wmi \\"x\\"\\n"} 1\n'
+    )
+
+
+def test_label_count_is_checked():
+    counter = Counter('test_total', 'Total', ['protocol'])
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_gauge_callback_is_read_at_scrape_time():
+    value = [1]
+    Gauge('test_active', 'Active scans', callback=lambda: value[0])
+    value[0] = 4
+    assert render_metrics().splitlines()[-1] == 'test_active 4'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_seconds', 'Latency', ['phase'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'detailed')
+    assert render_metrics().splitlines()[2:] == [
+        'test_seconds_bucket{phase="detailed",le="0.1"} 2',
+        'test_seconds_bucket{phase="detailed",le="1.0"} 3',
+        'test_seconds_bucket{phase="detailed",le="+Inf"} 4',
+        'test_seconds_sum{phase="detailed"} 3.65',
+        'test_seconds_count{phase="detailed"} 4',
+    ]
+
+
+def test_timer_observes_elapsed_time():
+    histogram = Histogram('test_timer_seconds', 'Latency')
+    with histogram.time():
+        pass
+    lines = render_metrics().splitlines()
+    assert 'test_timer_seconds_bucket{le="0.001"} 1' in lines
+    assert 'test_timer_seconds_count 1' in lines
+
+
+def test_metrics_endpoint(client):
+    Counter('test_endpoint_total', 'Scraped').inc()
+
+    async def run():
+        async with client:
+            return await client.get('/api/metrics')
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'test_endpoint_total 1' in response.text.splitlines()
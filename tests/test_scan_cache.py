@@ -0,0 +1,48 @@
+import asyncio
+
+from scan_cache import ScanResultCache
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = ScanResultCache(ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'count': 1}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute('k', compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {'count': 1} for r in results)
+    assert cache.get('k') == {'count': 1}
+
+
+def test_invalidate_during_computation_discards_the_stale_result():
+    cache = ScanResultCache(ttl=60)
+    values = iter([{'count': 1}, {'count': 2}])
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def compute():
+            value = next(values)
+            await gate.wait()
+            return value
+
+        first = asyncio.ensure_future(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0)
+        cache.invalidate()
+        # Started after the invalidation, so it must not join the stale computation
+        second = asyncio.ensure_future(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0)
+        gate.set()
+        return await first, await second
+
+    first, second = asyncio.run(run())
+    assert first == {'count': 1}
+    assert second == {'count': 2}
+    assert cache.get('k') == {'count': 2}
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from scan_scheduler import CronExpression
+
+# 2026-03-02 is a Monday
+MONDAY = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+
+
+def fires(expression, after=MONDAY, count=3):
+    cron, times = CronExpression(expression), []
+    for _ in range(count):
+        after = cron.next_after(after)
+        times.append(after)
+    return times
+
+
+def test_restricted_day_of_month_and_weekday_match_either():
+    # The 15th, or any Friday
+    assert [t.day for t in fires('0 9 15 * 5', count=4)] == [6, 13, 15, 20]
+
+
+def test_restricted_weekday_alone_ignores_day_of_month():
+    assert [t.day for t in fires('30 8 * * 1-2')] == [3, 9, 10]
+
+
+def test_restricted_day_of_month_alone_ignores_weekday():
+    assert [(t.month, t.day) for t in fires('0 0 31 * *')] == [(3, 31), (5, 31), (7, 31)]
+
+
+def test_sunday_is_zero_or_seven():
+    assert fires('0 6 * * 0') == fires('0 6 * * 7')
+    assert {t.weekday() for t in fires('0 6 * * 7')} == {6}
+
+
+def test_steps_lists_and_aliases():
+    assert [t.minute for t in fires('*/20 * * * *', count=4)] == [20, 40, 0, 20]
+    assert [t.hour for t in fires('0 1,13 * * *')] == [13, 1, 13]
+    assert fires('@weekly', count=1) == fires('0 0 * * 0', count=1)
+    assert fires('@hourly', count=1) == [datetime(2026, 3, 2, 13, 0, tzinfo=timezone.utc)]
+
+
+def test_next_after_is_strictly_later():
+    assert CronExpression('0 12 * * *').next_after(MONDAY) == datetime(2026, 3, 3, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('expression', ['0 0 * *', '60 * * * *', '* * 0 * *', '5-1 * * * *', '*/0 * * * *'])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_expression_that_never_fires():
+    with pytest.raises(ValueError, match='never matches'):
+        CronExpression('0 0 30 2 *').next_after(MONDAY)
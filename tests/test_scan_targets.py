@@ -0,0 +1,62 @@
+import ipaddress
+
+import pytest
+
+from scan_targets import TargetSet, merge_intervals, parse_target, subtract_intervals
+
+
+def test_merge_intervals_joins_overlapping_and_adjacent():
+    assert merge_intervals([(10, 20), (1, 3), (4, 5), (15, 30), (40, 40)]) == [(1, 5), (10, 30), (40, 40)]
+
+
+def test_subtract_intervals():
+    assert subtract_intervals([(1, 10), (20, 30)], [(0, 2), (5, 6), (10, 22), (30, 40)]) == [(3, 4), (7, 9), (23, 29)]
+    assert subtract_intervals([(1, 10)], []) == [(1, 10)]
+    assert subtract_intervals([(1, 10)], [(1, 10)]) == []
+
+
+def test_last_octet_shorthand():
+    assert parse_target('10.0.0.5-50') == parse_target('10.0.0.5-10.0.0.50')
+    assert TargetSet.parse('10.0.0.5-50').size() == 46
+
+
+@pytest.mark.parametrize('spec', ['10.0.0.50-5', '10.0.0.1-2001:db8::1', '10.0.0.256', '10.0.0.0/33', 'host'])
+def test_invalid_targets(spec):
+    with pytest.raises(ValueError):
+        parse_target(spec)
+
+
+def test_overlapping_targets_collapse():
+    targets = TargetSet.parse(['10.0.0.0/25', '10.0.0.100-200', '10.0.0.201'])
+    assert targets == TargetSet.parse('10.0.0.0-201')
+    assert targets.size() == 202
+
+
+def test_mixed_ipv4_and_ipv6():
+    targets = TargetSet.parse('10.0.0.0/30, 2001:db8::/126 2001:db8::2') - TargetSet.parse('10.0.0.1, 2001:db8::3')
+    assert targets.versions == [4, 6]
+    assert targets.size(4) == 3 and targets.size(6) == 3
+    assert targets.contains('10.0.0.2') and not targets.contains('10.0.0.1')
+    assert targets.contains('2001:db8::2') and not targets.contains('2001:db8::3')
+    assert not targets.contains('not-an-ip')
+    assert str(targets) == '10.0.0.0/32, 10.0.0.2/31, 2001:db8::/127, 2001:db8::2/128'
+
+
+def test_set_operations():
+    a, b = TargetSet.parse('10.0.0.0/24'), TargetSet.parse('10.0.0.128/25, 10.0.1.0/24')
+    assert (a & b) == TargetSet.parse('10.0.0.128/25')
+    assert (a | b) == TargetSet.parse('10.0.0.0-10.0.1.255')
+    assert not (a - a)
+
+
+def test_prefix_patterns_cover_the_set():
+    targets = TargetSet.parse('10.0.0.0/24, 10.0.0.9, 10.1.0.0/16, 172.16.5.7')
+    patterns = targets.prefix_patterns()
+    assert patterns == [r'^10\.0\.0\.', r'^10\.1\.', r'^172\.16\.5\.7$']
+    assert TargetSet.parse('0.0.0.0/4').prefix_patterns() is None
+    assert TargetSet.parse('10.0.0.1, 2001:db8::1').prefix_patterns() is None
+    assert TargetSet.parse('10.0.0.1, 10.0.0.3, 10.0.0.5').prefix_patterns(limit=2) is None
+
+
+def test_networks_are_minimal():
+    assert TargetSet.parse('10.0.0.0-10.0.0.255').networks() == [ipaddress.ip_network('10.0.0.0/24')]
@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+import pytest
+
+from topology import TopologyCollector, locate_devices, parse_fdb, parse_neighbours
+
+MAC_HOST = (0xAA, 0xBB, 0xCC, 0x00, 0x00, 0x01)
+MAC_REMOTE = (0xAA, 0xBB, 0xCC, 0x00, 0x00, 0x02)
+
+
+def switch_tables(**lldp_local):
+    """A switch whose bridge ports 1 and 2 are ifIndex 10101 and 10102; port 2 has an LLDP neighbour"""
+    return {
+        'if_name': {(10101,): b'Gi1/0/1', (10102,): b'Gi1/0/2'},
+        'base_port': {(1,): 10101, (2,): 10102},
+        'fdb': {MAC_HOST: 1, MAC_REMOTE: 2},
+        'lldp_chassis': {(0, 2, 1): bytes(MAC_REMOTE)},
+        'lldp_port': {(0, 2, 1): b'Gi0/48'},
+        **lldp_local,
+    }
+
+
+def locate(tables):
+    switch = {'ip_address': '10.0.0.254', 'fdb': parse_fdb(tables), 'neighbours': parse_neighbours(tables)}
+    macs = {'AA:BB:CC:00:00:01': ['host'], 'AA:BB:CC:00:00:02': ['remote']}
+    return switch, locate_devices([switch], macs)
+
+
+def test_lldp_port_number_maps_through_bridge_port_to_if_name():
+    # lldpLocPortDesc would be an alias like "uplink to core"; it must not be used
+    switch, attachments = locate(switch_tables(lldp_loc_subtype={(2,): 3}, lldp_loc_port={(2,): bytes(MAC_REMOTE)}))
+    assert switch['neighbours'][0]['local_port'] == 'Gi1/0/2'
+    assert attachments == {'host': {'attached_switch': '10.0.0.254', 'switch_port': 'Gi1/0/1', 'vlan': None}}
+
+
+def test_lldp_port_id_with_interface_name_subtype_is_used():
+    tables = switch_tables(lldp_loc_subtype={(7,): 5}, lldp_loc_port={(7,): b'Gi1/0/2'})
+    tables['lldp_chassis'] = {(0, 7, 1): bytes(MAC_REMOTE)}
+    switch, attachments = locate(tables)
+    assert switch['neighbours'][0]['local_port'] == 'Gi1/0/2'
+    assert 'remote' not in attachments
+
+
+def test_lldp_local_subtype_port_id_is_an_if_index():
+    tables = switch_tables(lldp_loc_subtype={(7,): 7}, lldp_loc_port={(7,): b'10102'})
+    tables['lldp_chassis'] = {(0, 7, 1): bytes(MAC_REMOTE)}
+    switch, _ = locate(tables)
+    assert switch['neighbours'][0]['local_port'] == 'Gi1/0/2'
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason='needs /proc')
+def test_collect_switch_releases_its_snmp_socket():
+    collector = TopologyCollector(timeout=0.1, retries=0)
+
+    async def run():
+        # Nothing answers SNMP on localhost, so every walk times out quickly
+        await collector.collect_switch('127.0.0.1', 'public')
+        before = len(os.listdir('/proc/self/fd'))
+        for _ in range(3):
+            await collector.collect_switch('127.0.0.1', 'public')
+        return len(os.listdir('/proc/self/fd')) - before
+
+    assert asyncio.run(run()) == 0
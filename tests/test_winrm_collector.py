@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_winrm import SAMPLE_INVENTORY, FakeWinRMServer
+from winrm_collector import WinRMCollector, format_inventory
+
+HOSTS = ['127.0.0.2', '127.0.0.3', '127.0.0.4']
+
+
+def test_format_inventory():
+    assert format_inventory(SAMPLE_INVENTORY) == {
+        'scan_type': 'WinRM',
+        'cpu': 'Intel(R) Xeon(R) Silver 4314 CPU @ 2.40GHz (16 cores, 32 threads)',
+        'memory': '64.0 GiB',
+        'disk': 'C: 280.4 GiB free of 476.0 GiB',
+        'os_release': 'Microsoft Windows Server 2022 Standard 10.0.20348',
+        'os_build': '20348',
+        'manufacturer': 'Dell Inc.',
+        'model': 'PowerEdge R650',
+        'hostname': 'BENCH-WIN01',
+        'domain': 'bench.local',
+        'installed_software_count': 87,
+    }
+
+
+def test_format_inventory_accepts_single_objects():
+    # ConvertTo-Json unwraps one-element arrays
+    specs = format_inventory({'cpu': {'name': 'CPU', 'cores': 2, 'threads': 4}, 'disks': {'drive': 'C:'}})
+    assert specs['cpu'] == 'CPU (2 cores, 4 threads)'
+    assert specs['disk'] == 'C: 0.0 GiB free of 0.0 GiB'
+
+
+@pytest.fixture
+def server():
+    with FakeWinRMServer() as server:
+        yield server
+
+
+@pytest.fixture
+def collector(server):
+    collector = WinRMCollector(transport='basic', port=server.port, max_concurrent=2, timeout=5)
+    yield collector
+    collector.close()
+
+
+def test_sessions_are_reused_across_rounds(server, collector):
+    async def run():
+        for _ in range(3):
+            results = await asyncio.gather(*(collector.collect(ip, 'user', 'secret') for ip in HOSTS))
+            assert all(result == format_inventory(SAMPLE_INVENTORY) for result in results)
+
+    asyncio.run(run())
+    assert server.stats['connections'] == len(HOSTS)
+    assert server.stats['Create'] == 3 * len(HOSTS)
+
+
+def test_broken_session_is_evicted(server, collector):
+    async def run():
+        await collector.collect(HOSTS[0], 'user', 'secret')
+        server.failures = 1
+        with pytest.raises(Exception):
+            await collector.collect(HOSTS[0], 'user', 'secret')
+        assert collector._sessions == {}
+        return await collector.collect(HOSTS[0], 'user', 'secret')
+
+    assert asyncio.run(run()) == format_inventory(SAMPLE_INVENTORY)
+    # The failed session was closed and the next scan connected afresh
+    assert server.stats['connections'] == 2
+
+
+def test_command_that_never_finishes_times_out(server):
+    server.hang = True
+    collector = WinRMCollector(transport='basic', port=server.port, max_concurrent=1, timeout=0.5)
+
+    async def run():
+        with pytest.raises(TimeoutError):
+            await collector.collect(HOSTS[0], 'user', 'secret')
+        assert collector._sessions == {}
+        # The worker was released: the next host is collected normally
+        server.hang = False
+        return await collector.collect(HOSTS[1], 'user', 'secret')
+
+    try:
+        assert asyncio.run(asyncio.wait_for(run(), timeout=10)) == format_inventory(SAMPLE_INVENTORY)
+    finally:
+        collector.close()
+    assert server.stats['Signal'] >= 1
+
+
+def test_server_certificates_are_validated_by_default():
+    collector = WinRMCollector(use_https=True)
+    protocol, _ = collector._session('10.0.0.1', 'user', 'secret')
+    assert protocol.transport.server_cert_validation == 'validate'
+    assert protocol.transport.endpoint == 'https://10.0.0.1:5986/wsman'
+    with pytest.raises(ValueError):
+        WinRMCollector(server_cert_validation='off')